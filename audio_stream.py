@@ -0,0 +1,289 @@
+"""
+流式音频转录
+接收客户端推送的音频块,增量解码到环形缓冲区,并用滑动窗口 Whisper 解码输出部分结果
+"""
+import time
+import uuid
+import queue
+import logging
+import threading
+import subprocess
+from typing import Callable, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Whisper 要求的采样率
+SAMPLE_RATE = 16000
+
+# 支持的流式输入格式
+#   pcm_s16le: 原始 16 位小端 PCM
+#   opus:      Ogg/WebM 封装的 Opus(也可以是 ffmpeg 能从管道识别的其他封装)
+STREAM_FORMATS = ["pcm_s16le", "opus"]
+
+
+class PCMRingBuffer:
+    """
+    float32 环形缓冲区
+
+    位置均为绝对样本序号(从流开始计数),缓冲区只保留最近 capacity 个样本。
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._data = np.zeros(capacity, dtype=np.float32)
+        self.total = 0  # 已写入的样本总数
+
+    @property
+    def start(self) -> int:
+        """缓冲区中最早仍可读取的样本位置"""
+        return max(0, self.total - self.capacity)
+
+    def write(self, samples: np.ndarray):
+        """写入样本,超出容量时覆盖最旧的数据"""
+        if len(samples) >= self.capacity:
+            # 流时钟按实际写入的样本数前进,缓冲区只保留最后 capacity 个
+            self.total += len(samples)
+            samples = samples[-self.capacity:]
+            offset = self.total % self.capacity
+            self._data[:] = np.roll(samples, offset)
+            return
+
+        offset = self.total % self.capacity
+        first = min(len(samples), self.capacity - offset)
+        self._data[offset:offset + first] = samples[:first]
+        self._data[:len(samples) - first] = samples[first:]
+        self.total += len(samples)
+
+    def read(self, position: int) -> np.ndarray:
+        """读取从 position 到当前末尾的样本(返回连续副本)"""
+        position = max(position, self.start)
+        count = self.total - position
+        offset = position % self.capacity
+        if offset + count <= self.capacity:
+            return self._data[offset:offset + count].copy()
+        return np.concatenate((self._data[offset:], self._data[:offset + count - self.capacity]))
+
+
+class PCMDecoder:
+    """16 kHz 单声道 s16le PCM 解码器,处理跨块的半个样本"""
+
+    def __init__(self):
+        self._pending = b""
+
+    def feed(self, data: bytes) -> np.ndarray:
+        data = self._pending + data
+        usable = len(data) - len(data) % 2
+        self._pending = data[usable:]
+        return np.frombuffer(data[:usable], dtype="<i2").astype(np.float32) / 32768.0
+
+    def flush(self) -> np.ndarray:
+        self._pending = b""
+        return np.zeros(0, dtype=np.float32)
+
+
+class FFmpegDecoder:
+    """
+    通过常驻 ffmpeg 进程增量解码(Opus 或非 16 kHz 单声道的 PCM)
+
+    音频块写入 ffmpeg 标准输入,后台线程从标准输出读取 16 kHz s16le PCM。
+    """
+
+    def __init__(self, input_args: list):
+        self._process = subprocess.Popen(
+            ['ffmpeg', '-loglevel', 'error', *input_args, '-i', 'pipe:0',
+             '-f', 's16le', '-acodec', 'pcm_s16le', '-ar', str(SAMPLE_RATE), '-ac', '1',
+             'pipe:1'],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL
+        )
+        self._pcm = PCMDecoder()
+        self._output = queue.Queue()
+        self._reader = threading.Thread(target=self._read_output, daemon=True)
+        self._reader.start()
+
+    def _read_output(self):
+        while True:
+            data = self._process.stdout.read1(65536)
+            if not data:
+                break
+            self._output.put(data)
+
+    def _drain(self) -> np.ndarray:
+        chunks = []
+        while True:
+            try:
+                chunks.append(self._output.get_nowait())
+            except queue.Empty:
+                break
+        return self._pcm.feed(b"".join(chunks))
+
+    def feed(self, data: bytes) -> np.ndarray:
+        try:
+            self._process.stdin.write(data)
+            self._process.stdin.flush()
+        except BrokenPipeError:
+            raise RuntimeError("ffmpeg 解码进程已退出,请检查音频格式")
+        return self._drain()
+
+    def flush(self) -> np.ndarray:
+        """关闭输入并取回 ffmpeg 缓冲中剩余的样本"""
+        try:
+            self._process.stdin.close()
+        except BrokenPipeError:
+            pass
+        self._reader.join()
+        self._process.wait()
+        return self._drain()
+
+    def close(self):
+        if self._process.poll() is None:
+            self._process.kill()
+        self._process.wait()
+
+
+def create_decoder(audio_format: str, sample_rate: int = SAMPLE_RATE, channels: int = 1):
+    """根据输入格式创建解码器"""
+    if audio_format == "pcm_s16le":
+        if sample_rate == SAMPLE_RATE and channels == 1:
+            return PCMDecoder()
+        return FFmpegDecoder(['-f', 's16le', '-ar', str(sample_rate), '-ac', str(channels)])
+    if audio_format == "opus":
+        return FFmpegDecoder([])
+    raise ValueError(f"不支持的流式音频格式 '{audio_format}',支持: {', '.join(STREAM_FORMATS)}")
+
+
+class StreamSession:
+    """
+    一个流式转录会话
+
+    每累积 step_seconds 秒新音频,就对缓冲区中尚未确认的音频(最长 window_seconds 秒)
+    做一次 Whisper 解码。除最后一个片段外的结果被确认,窗口起点随之前移;
+    最后一个片段可能被截断,作为临时结果在下次解码时重新识别。
+
+    transcribe_fn(audio, language, prompt) 需返回 Whisper 格式的结果字典,
+    audio 为 16 kHz float32 数组。owner 为创建会话的客户端,由调用方用于访问控制。
+    """
+
+    def __init__(
+        self,
+        transcribe_fn: Callable[[np.ndarray, Optional[str], Optional[str]], dict],
+        language: Optional[str] = None,
+        audio_format: str = "pcm_s16le",
+        sample_rate: int = SAMPLE_RATE,
+        channels: int = 1,
+        window_seconds: float = 30.0,
+        step_seconds: float = 2.0,
+        owner: object = None
+    ):
+        self.session_id = uuid.uuid4().hex[:12]
+        self.owner = owner
+        self.last_active = time.monotonic()  # 最近一次推送/结束的时间,用于清理空闲会话
+        self.language = language
+        self.audio_format = audio_format
+        self._transcribe_fn = transcribe_fn
+        self._decoder = create_decoder(audio_format, sample_rate, channels)
+        self._buffer = PCMRingBuffer(int(window_seconds * SAMPLE_RATE))
+        self._step = int(step_seconds * SAMPLE_RATE)
+        self._lock = threading.Lock()
+
+        self.window_start = 0    # 未确认音频的起点(绝对样本位置)
+        self.last_decoded = 0    # 上次解码时的缓冲区末尾
+        self.committed = []      # 已确认片段 [{"start", "end", "text"}]
+        self.tentative = []      # 临时片段
+        self.language_detected = language
+
+    @property
+    def duration(self) -> float:
+        """已接收音频时长(秒)"""
+        return self._buffer.total / SAMPLE_RATE
+
+    def push(self, data: bytes) -> bool:
+        """
+        推送一个音频块
+
+        Returns:
+            本次是否触发了解码(即部分结果是否有更新)
+        """
+        self.last_active = time.monotonic()
+        with self._lock:
+            try:
+                samples = self._decoder.feed(data)
+                self._write(samples)
+                if self._buffer.total - self.last_decoded >= self._step:
+                    self._decode(final=False)
+                    return True
+                return False
+            finally:
+                self.last_active = time.monotonic()
+
+    def finish(self) -> list:
+        """结束会话,解码剩余音频并返回全部片段"""
+        with self._lock:
+            self._write(self._decoder.flush())
+            if self._buffer.total > self.window_start:
+                self._decode(final=True)
+            self.committed.extend(self.tentative)
+            self.tentative = []
+            return self.committed
+
+    def close(self):
+        """释放解码器资源"""
+        if isinstance(self._decoder, FFmpegDecoder):
+            self._decoder.close()
+
+    def segments(self) -> list:
+        """当前全部片段(已确认 + 临时)"""
+        return self.committed + self.tentative
+
+    def _write(self, samples: np.ndarray):
+        """
+        写入样本,保证未确认的音频不会被覆盖
+
+        每次最多写入缓冲区剩余空间(容量 - 未确认音频)的样本;
+        空间用完时先强制解码并确认当前窗口,再继续写入。
+        """
+        while len(samples):
+            room = self._buffer.capacity - (self._buffer.total - self.window_start)
+            if room <= 0:
+                logger.warning(f"流 {self.session_id}: 窗口已满,强制确认当前结果")
+                self._decode(final=True)
+                room = self._buffer.capacity - (self._buffer.total - self.window_start)
+                if room <= 0:
+                    # 整个窗口已按最终结果解码,剩余部分没有识别出内容
+                    self.window_start = self._buffer.total
+                    room = self._buffer.capacity
+            self._buffer.write(samples[:room])
+            samples = samples[room:]
+
+    def _decode(self, final: bool):
+        audio = self._buffer.read(self.window_start)
+        offset = max(self.window_start, self._buffer.start) / SAMPLE_RATE
+        self.last_decoded = self._buffer.total
+        if len(audio) == 0:
+            return
+
+        prompt = "".join(seg["text"] for seg in self.committed[-3:]) or None
+        result = self._transcribe_fn(audio, self.language, prompt)
+        self.language_detected = self.language_detected or result.get("language")
+
+        segments = [
+            {
+                "start": offset + seg["start"],
+                "end": offset + seg["end"],
+                "text": seg["text"],
+            }
+            for seg in result.get("segments", [])
+            if seg["text"].strip()
+        ]
+
+        if final:
+            stable, self.tentative = segments, []
+        else:
+            stable, self.tentative = segments[:-1], segments[-1:]
+
+        if stable:
+            self.committed.extend(stable)
+            self.window_start = min(int(stable[-1]["end"] * SAMPLE_RATE), self._buffer.total)
+        elif final:
+            self.window_start = self._buffer.total
@@ -0,0 +1,131 @@
+"""
+词级时间戳基准测试
+对比片段级模式与词级模式的内存占用和合并耗时
+
+用法:
+    python benchmark_word_timestamps.py [分钟数]            # 使用合成数据
+    python benchmark_word_timestamps.py --audio <音频文件>   # 使用真实模型转录
+"""
+import sys
+import copy
+import time
+import random
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+from server import (
+    extract_word_arrays,
+    merge_transcription_with_diarization,
+    merge_words_with_diarization,
+)
+
+
+def make_synthetic(duration_minutes: float, seed: int = 0):
+    """生成与 Whisper 输出结构相同的合成转录和说话人时间线"""
+    rng = random.Random(seed)
+    total = duration_minutes * 60
+
+    segments = []
+    t = 0.0
+    while t < total:
+        words = []
+        seg_start = t
+        for _ in range(rng.randint(5, 25)):
+            length = rng.uniform(0.15, 0.6)
+            words.append({
+                "word": " w",
+                "start": round(t, 2),
+                "end": round(t + length, 2),
+                "probability": rng.random(),
+            })
+            t += length + rng.uniform(0.0, 0.2)
+        segments.append({
+            "start": seg_start,
+            "end": t,
+            "text": "".join(w["word"] for w in words),
+            "words": words,
+        })
+        t += rng.uniform(0.0, 1.0)
+
+    diarization = []
+    t = 0.0
+    while t < total:
+        length = rng.uniform(1.0, 20.0)
+        diarization.append({
+            "start": t,
+            "end": t + length,
+            "speaker": f"SPEAKER_{rng.randint(0, 3):02d}",
+        })
+        t += length + rng.uniform(0.0, 0.5)
+
+    return {"segments": segments, "language": "zh"}, diarization
+
+
+def measure(label: str, func, *args):
+    """执行函数并返回 (结果, 耗时, 峰值内存)"""
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func(*args)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<32} 耗时 {elapsed * 1000:9.1f} ms    峰值内存 {peak / 1024 / 1024:8.2f} MB")
+    return result
+
+
+def word_storage_bytes(words: dict) -> int:
+    """列式数组中数值列的字节数"""
+    return sum(words[key].nbytes for key in ("start", "end", "probability", "segment"))
+
+
+def dict_storage_bytes(segments: list) -> int:
+    """片段中词字典列表的近似字节数(不含共享的字符串)"""
+    total = 0
+    for seg in segments:
+        words = seg.get("words", [])
+        total += sys.getsizeof(words)
+        for word in words:
+            total += sys.getsizeof(word)
+            total += sum(sys.getsizeof(v) for k, v in word.items() if k != "word")
+    return total
+
+
+def run_synthetic(duration_minutes: float):
+    transcription, diarization = make_synthetic(duration_minutes)
+    num_words = sum(len(seg["words"]) for seg in transcription["segments"])
+    print(f"合成数据: {duration_minutes:.0f} 分钟, {len(transcription['segments'])} 个片段, "
+          f"{num_words} 个词, {len(diarization)} 个说话人段")
+    print("-" * 80)
+
+    dict_bytes = dict_storage_bytes(transcription["segments"])
+    word_transcription = copy.deepcopy(transcription)
+
+    measure("片段级合并", merge_transcription_with_diarization, transcription, diarization)
+
+    words = measure("词级: 转换为列式数组", extract_word_arrays, word_transcription)
+    word_transcription["words"] = words
+    measure("词级: 按词分配并合并", merge_words_with_diarization, word_transcription, diarization)
+
+    print("-" * 80)
+    print(f"词数据存储: 字典列表 {dict_bytes / 1024 / 1024:.2f} MB -> "
+          f"列式数组 {word_storage_bytes(words) / 1024 / 1024:.2f} MB (另有 {num_words} 个词文本)")
+
+
+def run_audio(audio_path: str):
+    from server import convert_to_wav, transcribe_with_whisper, perform_diarization
+
+    wav_path = convert_to_wav(audio_path)
+    diarization = perform_diarization(wav_path)
+
+    segment_result = measure("片段级转录", transcribe_with_whisper, wav_path, None, False)
+    word_result = measure("词级转录", transcribe_with_whisper, wav_path, None, True)
+    measure("片段级合并", merge_transcription_with_diarization, segment_result, diarization)
+    measure("词级合并", merge_words_with_diarization, word_result, diarization)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 2 and sys.argv[1] == "--audio":
+        run_audio(sys.argv[2])
+    else:
+        run_synthetic(float(sys.argv[1]) if len(sys.argv) > 1 else 60)
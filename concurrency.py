@@ -0,0 +1,71 @@
+"""
+并发控制
+网络传输模式下多个客户端共享同一进程和模型,这里限制总并发并保证客户端之间的公平性
+"""
+import asyncio
+import logging
+import weakref
+from contextlib import asynccontextmanager
+
+logger = logging.getLogger(__name__)
+
+
+class FairRequestLimiter:
+    """
+    两级信号量限流
+
+    每个客户端先获取自己的槽位(per_client 个),再排队获取全局槽位(max_concurrent 个)。
+    由于每个客户端同时最多只有 per_client 个请求在全局队列中等待,
+    asyncio.Semaphore 的先来先服务顺序使各客户端大致轮流获得执行机会,
+    单个客户端的大量请求不会饿死其他客户端。
+    """
+
+    def __init__(self, max_concurrent: int = 2, per_client: int = 1):
+        self.max_concurrent = max_concurrent
+        self.per_client = per_client
+        self._global = None
+        self._clients = weakref.WeakKeyDictionary()
+        self.active = 0
+        self.waiting = 0
+
+    def _client_semaphore(self, client) -> asyncio.Semaphore:
+        semaphore = self._clients.get(client)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.per_client)
+            self._clients[client] = semaphore
+        return semaphore
+
+    @asynccontextmanager
+    async def slot(self, client):
+        """
+        获取一个执行槽位
+
+        client 为任意可弱引用的对象(通常是 MCP 会话),会话关闭后其状态自动释放。
+        """
+        if self._global is None:
+            self._global = asyncio.Semaphore(self.max_concurrent)
+
+        self.waiting += 1
+        admitted = False
+        try:
+            async with self._client_semaphore(client):
+                async with self._global:
+                    self.waiting -= 1
+                    admitted = True
+                    self.active += 1
+                    try:
+                        yield
+                    finally:
+                        self.active -= 1
+        finally:
+            # 排队期间被取消(如客户端断开)
+            if not admitted:
+                self.waiting -= 1
+
+    def status(self) -> dict:
+        return {
+            "active": self.active,
+            "waiting": self.waiting,
+            "clients": len(self._clients),
+            "max_concurrent": self.max_concurrent,
+        }
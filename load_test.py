@@ -0,0 +1,257 @@
+"""
+MCP Server 负载测试
+按可配置的请求组合(短/长音频、是否说话人分离、重复文件)并发调用 transcribe_audio,
+统计吞吐量、延迟分位数、排队时间和失败率
+
+stdio 模式(默认,完全离线):
+    以模拟后端(stub_backend.py)启动服务器,按文件名中的时长模拟处理耗时和内存,
+    不需要模型文件、GPU 或网络:
+    python load_test.py --requests 40 --concurrency 8 --long-ratio 0.2 \\
+        --server-args "--max-concurrent 2 --per-client 8 --memory-budget-gb 4"
+    指定 --audio 时改为启动使用真实模型的 server.py,测量真实处理耗时(不再报告排队时间)。
+
+sse 模式:
+    连接已运行的服务器,观察吞吐量和延迟随客户端数量的变化。
+    服务器可以使用真实模型(需用 --audio 指定服务器上可访问的音频文件),
+    也可以用 python stub_backend.py --server --transport sse 启动模拟后端:
+    python load_test.py --transport sse --url http://127.0.0.1:8000/sse --clients 1,2,4,8
+"""
+import os
+import re
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+import statistics
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+import stub_backend
+
+TERMINAL_STATES = ("已完成", "失败", "已取消")
+
+
+def build_plan(args, workdir: Path) -> list:
+    """生成请求列表,合成的音频文件名中带有时长,供模拟后端使用"""
+    rng = random.Random(args.seed)
+    short_range = [float(v) for v in args.short_range.split(",")]
+    long_range = [float(v) for v in args.long_range.split(",")]
+    real_files = args.audio or []
+
+    plan = []
+    for i in range(args.requests):
+        if plan and rng.random() < args.duplicate_ratio:
+            request = dict(rng.choice(plan))
+            request["duplicate"] = True
+        else:
+            diarization = rng.random() < args.diarization_ratio
+            if real_files:
+                path = str(Path(real_files[i % len(real_files)]).resolve())
+                request = {"path": path, "duration": None, "category": "real"}
+            else:
+                category = "long" if rng.random() < args.long_ratio else "short"
+                low, high = long_range if category == "long" else short_range
+                duration = round(rng.uniform(low, high))
+                path = workdir / f"clip_{i:04d}_{duration}s.wav"
+                path.touch()
+                request = {"path": str(path), "duration": duration, "category": category}
+            request["diarization"] = diarization
+            request["duplicate"] = False
+        plan.append(request)
+    return plan
+
+
+async def run_request(session, request: dict, args, stub_config) -> dict:
+    """发送一个转录请求;长音频任务轮询 get_job_status 直到结束"""
+    start = time.perf_counter()
+    ok, error = False, None
+    try:
+        result = await asyncio.wait_for(session.call_tool("transcribe_audio", {
+            "audio_file_path": request["path"],
+            "language": "zh",
+            "enable_diarization": request["diarization"],
+        }), timeout=args.timeout)
+        text = result.content[0].text if result.content else ""
+        job = re.search(r"任务ID: (\w+)", text)
+
+        if result.isError or text.startswith("❌") or text.startswith("工具执行错误"):
+            error = text.splitlines()[0][:200] if text else "空响应"
+        elif job:
+            while True:
+                await asyncio.sleep(args.poll_interval)
+                if time.perf_counter() - start > args.timeout:
+                    raise asyncio.TimeoutError()
+                status = await session.call_tool("get_job_status", {"job_id": job.group(1)})
+                status_text = status.content[0].text
+                if any(state in status_text for state in TERMINAL_STATES):
+                    ok = "已完成" in status_text
+                    error = None if ok else status_text.splitlines()[0][:200]
+                    break
+        else:
+            ok = True
+    except asyncio.TimeoutError:
+        error = "超时"
+    except Exception as e:
+        error = str(e)
+
+    latency = time.perf_counter() - start
+    queue_delay = None
+    if stub_config is not None and request["duration"] is not None:
+        # 模拟后端的处理耗时是确定的,延迟减去处理耗时即排队(及进程启动)时间
+        service = stub_backend.service_time(
+            stub_config, request["path"], request["duration"], request["diarization"]
+        )
+        queue_delay = max(0.0, latency - service)
+
+    return {**request, "ok": ok, "error": error, "latency": latency, "queue_delay": queue_delay}
+
+
+async def run_plan(sessions: list, plan: list, args, stub_config) -> tuple:
+    """以 concurrency 个并发槽位执行全部请求,请求轮流分配给各客户端会话"""
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def worker(index: int, request: dict):
+        async with semaphore:
+            return await run_request(sessions[index % len(sessions)], request, args, stub_config)
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*(worker(i, request) for i, request in enumerate(plan)))
+    return results, time.perf_counter() - start
+
+
+def percentile(values: list, q: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def report(results: list, elapsed: float, clients: int):
+    """按请求类别输出统计"""
+    groups = {"全部": results}
+    for result in results:
+        key = result["category"] + ("+分离" if result["diarization"] else "")
+        groups.setdefault(key, []).append(result)
+
+    print(f"\n客户端数 {clients}, 总耗时 {elapsed:.2f} 秒, "
+          f"吞吐量 {len(results) / elapsed:.2f} 请求/秒, "
+          f"重复文件请求 {sum(r['duplicate'] for r in results)} 个")
+    print(f"{'类别':<12} {'请求':>5} {'失败率':>7} {'p50(s)':>8} {'p95(s)':>8} {'p99(s)':>8} "
+          f"{'max(s)':>8} {'排队p50':>8} {'排队p95':>8}")
+    for name, group in groups.items():
+        latencies = [r["latency"] for r in group]
+        delays = [r["queue_delay"] for r in group if r["queue_delay"] is not None]
+        failures = sum(not r["ok"] for r in group)
+        delay_p50 = f"{statistics.median(delays):8.2f}" if delays else f"{'-':>8}"
+        delay_p95 = f"{percentile(delays, 0.95):8.2f}" if delays else f"{'-':>8}"
+        print(f"{name:<12} {len(group):>5} {failures / len(group):>7.1%} "
+              f"{statistics.median(latencies):>8.2f} {percentile(latencies, 0.95):>8.2f} "
+              f"{percentile(latencies, 0.99):>8.2f} {max(latencies):>8.2f} {delay_p50} {delay_p95}")
+
+    errors = [r["error"] for r in results if r["error"]]
+    for error in errors[:5]:
+        print(f"  失败示例: {error}")
+
+
+async def run_stdio(args, plan: list, workdir: Path, stub_config):
+    """启动 stdio 服务器并执行请求;stub_config 为 None 时(指定了 --audio)启动真实后端 server.py"""
+    from mcp import ClientSession, StdioServerParameters
+    from mcp.client.stdio import stdio_client
+
+    env = os.environ.copy()
+    env["STT_TRANSCRIPT_DB"] = str(workdir / "transcripts.db")
+    if stub_config is not None:
+        env["STT_STUB_CONFIG"] = json.dumps(stub_config)
+        server_args = [str(Path(__file__).parent / "stub_backend.py"), "--server"]
+    else:
+        server_args = [str(Path(__file__).parent / "server.py")]
+    params = StdioServerParameters(
+        command=sys.executable,
+        args=[*server_args, *args.server_args.split()],
+        env=env,
+    )
+
+    async with stdio_client(params) as (read_stream, write_stream):
+        async with ClientSession(read_stream, write_stream) as session:
+            await session.initialize()
+            results, elapsed = await run_plan([session], plan, args, stub_config)
+            report(results, elapsed, clients=1)
+
+
+async def run_sse(args, plan: list, stub_config):
+    from contextlib import AsyncExitStack
+    from mcp import ClientSession
+    from mcp.client.sse import sse_client
+
+    for clients in (int(c) for c in args.clients.split(",")):
+        async with AsyncExitStack() as stack:
+            sessions = []
+            for _ in range(clients):
+                headers = {"Authorization": f"Bearer {args.auth_token}"} if args.auth_token else None
+                read_stream, write_stream = await stack.enter_async_context(sse_client(args.url, headers=headers))
+                session = await stack.enter_async_context(ClientSession(read_stream, write_stream))
+                await session.initialize()
+                sessions.append(session)
+            results, elapsed = await run_plan(sessions, plan, args, stub_config)
+            report(results, elapsed, clients)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="MCP Server 负载测试")
+    parser.add_argument("--transport", choices=["stdio", "sse"], default="stdio")
+    parser.add_argument("--url", default="http://127.0.0.1:8000/sse", help="SSE 端点")
+    parser.add_argument("--clients", default="1,2,4,8", help="SSE 模式下逗号分隔的客户端数量")
+    parser.add_argument("--auth-token", default=os.environ.get("STT_AUTH_TOKEN"), help="SSE 服务器的访问令牌")
+    parser.add_argument("--server-args", default="", help="stdio 模式传给服务器的参数")
+
+    # 请求组合
+    parser.add_argument("--requests", type=int, default=40, help="请求总数")
+    parser.add_argument("--concurrency", type=int, default=8, help="同时在途的请求数")
+    parser.add_argument("--long-ratio", type=float, default=0.2, help="长音频(>3分钟)比例")
+    parser.add_argument("--diarization-ratio", type=float, default=0.5, help="启用说话人分离的比例")
+    parser.add_argument("--duplicate-ratio", type=float, default=0.1, help="重复提交已有文件的比例")
+    parser.add_argument("--short-range", default="10,180", help="短音频时长范围(秒)")
+    parser.add_argument("--long-range", default="240,1200", help="长音频时长范围(秒)")
+    parser.add_argument("--audio", nargs="*",
+                        help="使用真实音频文件代替合成文件;stdio 模式下改为启动真实后端 server.py")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--timeout", type=float, default=600, help="单个请求超时(秒)")
+    parser.add_argument("--poll-interval", type=float, default=0.2, help="长音频任务状态轮询间隔(秒)")
+
+    # 模拟后端
+    parser.add_argument("--rtf", type=float, default=stub_backend.DEFAULT_CONFIG["rtf"])
+    parser.add_argument("--diarization-rtf", type=float, default=stub_backend.DEFAULT_CONFIG["diarization_rtf"])
+    parser.add_argument("--model-load", type=float, default=stub_backend.DEFAULT_CONFIG["model_load"])
+    parser.add_argument("--memory-scale", type=float, default=stub_backend.DEFAULT_CONFIG["memory_scale"])
+    parser.add_argument("--failure-rate", type=float, default=stub_backend.DEFAULT_CONFIG["failure_rate"])
+    args = parser.parse_args()
+
+    stub_config = None
+    if not args.audio:
+        stub_config = dict(stub_backend.DEFAULT_CONFIG)
+        stub_config.update({
+            "rtf": args.rtf,
+            "diarization_rtf": args.diarization_rtf,
+            "model_load": args.model_load,
+            "memory_scale": args.memory_scale,
+            "failure_rate": args.failure_rate,
+            "seed": args.seed,
+        })
+
+    with tempfile.TemporaryDirectory(prefix="stt_load_test_") as tmp:
+        workdir = Path(tmp)
+        plan = build_plan(args, workdir)
+        backend = "模拟后端" if stub_config is not None else "真实后端"
+        print(f"请求: {len(plan)} 个, 并发: {args.concurrency}, 传输: {args.transport}, {backend}")
+
+        if args.transport == "stdio":
+            await run_stdio(args, plan, workdir, stub_config)
+        else:
+            await run_sse(args, plan, stub_config)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
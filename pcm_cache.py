@@ -0,0 +1,169 @@
+"""
+PCM 音频缓存
+把解码后的 16 kHz 单声道音频按内容哈希保存为原始 PCM 文件,各进程以内存映射方式共享同一份数据
+
+文件格式: 32 字节文件头 + 连续的 PCM 样本
+    magic        8 字节  b"STTPCM01"
+    sample_rate  uint32
+    channels     uint16
+    dtype        uint16  (1 = int16, 2 = float32)
+    num_samples  uint64
+    保留          8 字节
+"""
+import os
+import time
+import struct
+import hashlib
+import logging
+import tempfile
+import subprocess
+from pathlib import Path
+from typing import Optional, Union
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = 16000
+MAGIC = b"STTPCM01"
+HEADER = struct.Struct("<8sIHHQ8x")
+HEADER_SIZE = HEADER.size
+
+# dtype 编码 -> (numpy 类型, ffmpeg 输出格式, ffmpeg 编码器)
+DTYPES = {
+    1: (np.dtype("<i2"), "s16le", "pcm_s16le"),
+    2: (np.dtype("<f4"), "f32le", "pcm_f32le"),
+}
+DTYPE_CODES = {"int16": 1, "float32": 2}
+
+# 默认缓存位置和容量,可通过环境变量修改
+DEFAULT_CACHE_DIR = Path(tempfile.gettempdir()) / "stt_pcm_cache"
+DEFAULT_MAX_GB = 10.0
+
+
+def open_pcm(path: Union[str, Path]) -> np.memmap:
+    """
+    以内存映射方式打开缓存文件,返回一维样本数组
+
+    使用写时复制映射(mode="c"): 文件本身只读打开,多个进程共享页缓存中的同一份数据;
+    数组可以直接交给 torch.from_numpy 而不触发只读数组警告,意外写入也只影响本进程的私有副本。
+    切片(如 audio[start:end])是视图,不会分配新内存。
+    """
+    with open(path, "rb") as f:
+        magic, sample_rate, channels, dtype_code, num_samples = HEADER.unpack(f.read(HEADER_SIZE))
+    if magic != MAGIC:
+        raise ValueError(f"不是有效的 PCM 缓存文件: {path}")
+    dtype = DTYPES[dtype_code][0]
+    if num_samples == 0:
+        return np.zeros(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode="c", offset=HEADER_SIZE, shape=(num_samples * channels,))
+
+
+class PCMCache:
+    """
+    按内容寻址的 PCM 缓存
+
+    缓存键为 音频文件内容 + 解码参数 的哈希,同一音频无论路径如何只解码一次。
+    总大小超过 max_bytes 时按最近使用时间淘汰最旧的文件。
+    """
+
+    def __init__(self, cache_dir: Optional[Union[str, Path]] = None,
+                 max_bytes: Optional[int] = None, dtype: str = "float32"):
+        self.cache_dir = Path(cache_dir or os.environ.get("STT_PCM_CACHE_DIR", DEFAULT_CACHE_DIR))
+        if max_bytes is None:
+            max_bytes = int(float(os.environ.get("STT_PCM_CACHE_MAX_GB", DEFAULT_MAX_GB)) * 1024 ** 3)
+        self.max_bytes = max_bytes
+        self.dtype_code = DTYPE_CODES[dtype]
+
+    def key(self, audio_path: Union[str, Path]) -> str:
+        """音频内容和解码参数的哈希"""
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(f"{SAMPLE_RATE}:1:{self.dtype_code}:".encode())
+        with open(audio_path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def get(self, audio_path: Union[str, Path]) -> Path:
+        """返回音频对应的缓存文件路径,不存在时先解码"""
+        target = self.cache_dir / f"{self.key(audio_path)}.pcm"
+        if target.exists():
+            # 更新修改时间作为最近使用时间,供淘汰时参考
+            try:
+                os.utime(target)
+            except OSError:
+                pass
+            logger.info(f"PCM 缓存命中: {target.name}")
+            return target
+
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self._decode(audio_path, target)
+        self.evict(keep=target)
+        return target
+
+    def evict(self, keep: Optional[Path] = None):
+        """删除最久未使用的缓存文件,直到总大小不超过上限"""
+        entries = []
+        for path in self.cache_dir.glob("*.pcm"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            try:
+                # POSIX 上删除正在被映射的文件是安全的,映射在关闭前仍然有效;
+                # Windows 上会失败,跳过即可
+                path.unlink()
+                total -= size
+                logger.info(f"PCM 缓存淘汰: {path.name} ({size / 1024 / 1024:.1f} MB)")
+            except OSError:
+                continue
+
+    def _decode(self, audio_path: Union[str, Path], target: Path):
+        """用 ffmpeg 把音频直接解码到缓存文件(样本不经过 Python 内存)"""
+        dtype, sample_format, codec = DTYPES[self.dtype_code]
+        tmp = target.with_suffix(f".{os.getpid()}.{time.monotonic_ns()}.tmp")
+        logger.info(f"正在解码音频到 PCM 缓存: {Path(audio_path).name}")
+
+        try:
+            with open(tmp, "w+b") as f:
+                f.write(b"\0" * HEADER_SIZE)
+                f.flush()
+                # ffmpeg 继承文件描述符,从文件头之后开始写入
+                process = subprocess.Popen([
+                    'ffmpeg', '-loglevel', 'error', '-i', str(audio_path),
+                    '-f', sample_format, '-acodec', codec,
+                    '-ar', str(SAMPLE_RATE), '-ac', '1',
+                    'pipe:1'
+                ], stdout=f, stderr=subprocess.PIPE)
+                _, stderr = process.communicate()
+                if process.returncode != 0:
+                    raise RuntimeError(
+                        f"音频解码失败: {stderr.decode('utf-8', errors='ignore').strip()}"
+                    )
+
+                data_bytes = f.seek(0, os.SEEK_END) - HEADER_SIZE
+                num_samples = data_bytes // dtype.itemsize
+                f.seek(0)
+                f.write(HEADER.pack(MAGIC, SAMPLE_RATE, 1, self.dtype_code, num_samples))
+
+            # 多个进程同时解码同一音频时结果相同,先完成的写入缓存,其余直接使用已有文件
+            # (Windows 上目标文件被其他进程映射时无法替换)
+            if not target.exists():
+                try:
+                    os.replace(tmp, target)
+                except OSError:
+                    if not target.exists():
+                        raise
+        finally:
+            if tmp.exists():
+                tmp.unlink()
+
+        logger.info(f"已写入 PCM 缓存: {target.name} ({num_samples / SAMPLE_RATE:.1f} 秒)")
@@ -0,0 +1,349 @@
+"""
+任务性能分析
+按流水线阶段(ffmpeg 解码、模型加载、编码器、解码器、说话人分离各步骤、合并)计时,
+并用栈采样和 torch.profiler 生成可视化文件,用于定位生产环境中的性能回退
+
+输出文件(与转录结果同目录):
+    <输出>.trace.json      Chrome trace,可在 chrome://tracing 或 https://ui.perfetto.dev 打开
+    <输出>.collapsed.txt   折叠栈,可用 flamegraph.pl 或 https://www.speedscope.app 生成火焰图
+"""
+import os
+import sys
+import json
+import time
+import logging
+import threading
+from pathlib import Path
+from collections import Counter, defaultdict
+from contextlib import contextmanager, nullcontext
+
+logger = logging.getLogger(__name__)
+
+# 音频不超过该时长时才启用 torch.profiler 记录算子(长音频的算子事件过多,trace 文件过大)
+TORCH_PROFILE_MAX_SECONDS = 300
+
+# Chrome trace 中最多记录的模块调用事件数,超出部分只计入汇总
+MAX_MODULE_EVENTS = 20000
+
+# torch.profiler 是进程级的,同一时间只能有一个任务使用
+_TORCH_PROFILER_LOCK = threading.Lock()
+
+
+class JobProfiler:
+    """
+    单个转录任务的性能分析器
+
+    enabled 为 False 时所有方法都是空操作,调用方无需判断。
+    """
+
+    def __init__(self, output_base: Path, enabled: bool = True, torch_ops: bool = False,
+                 sample_interval: float = 0.01):
+        self.output_base = Path(output_base)
+        self.enabled = enabled
+        self.torch_ops = torch_ops
+        self.sample_interval = sample_interval
+
+        self._origin = time.perf_counter()
+        self._origin_wall = time.time()
+        self._events = []                       # Chrome trace 事件
+        self._stage_totals = defaultdict(float)
+        self._module_totals = defaultdict(float)
+        self._module_calls = Counter()
+        self._samples = Counter()
+        self._active = {}                       # 线程 ID -> 当前阶段栈
+        self._lock = threading.Lock()
+        self._hooks = []
+        self._step_closers = []
+        self._sampler = None
+        self._stop_sampling = threading.Event()
+        self._torch_profiler = None              # 已结束的 torch.profiler,stop() 时导出
+        self._torch_active = False
+
+    def start(self):
+        if not self.enabled:
+            return
+        self._origin = time.perf_counter()
+        self._origin_wall = time.time()
+        self._sampler = threading.Thread(target=self._sample_loop, name="profiler-sampler", daemon=True)
+        self._sampler.start()
+        logger.info(f"性能分析已启用 (torch 算子记录: {'是' if self.torch_ops else '否'})")
+
+    @contextmanager
+    def torch_scope(self):
+        """
+        在当前线程记录 torch 算子
+
+        torch.profiler 只记录启动它的线程,因此必须在执行流水线的线程中(如 asyncio.to_thread
+        的工作线程内)包住整个流水线,而不是在调用 start() 的线程中启动。
+        """
+        if not (self.enabled and self.torch_ops):
+            yield
+            return
+        if not _TORCH_PROFILER_LOCK.acquire(blocking=False):
+            logger.warning("其他任务正在使用 torch.profiler,本任务仅使用栈采样")
+            yield
+            return
+
+        try:
+            import torch
+            from torch.profiler import profile, ProfilerActivity
+            activities = [ProfilerActivity.CPU]
+            if torch.cuda.is_available():
+                activities.append(ProfilerActivity.CUDA)
+            profiler = profile(activities=activities)
+            profiler.start()
+        except Exception as e:
+            logger.warning(f"无法启动 torch.profiler,仅使用栈采样: {e}")
+            _TORCH_PROFILER_LOCK.release()
+            yield
+            return
+
+        self._torch_profiler = profiler
+        self._torch_active = True
+        try:
+            yield
+        finally:
+            self._torch_active = False
+            try:
+                profiler.stop()
+            finally:
+                _TORCH_PROFILER_LOCK.release()
+
+    @contextmanager
+    def stage(self, name: str):
+        """标记一个流水线阶段"""
+        if not self.enabled:
+            yield
+            return
+
+        thread_id = threading.get_ident()
+        with self._lock:
+            self._active.setdefault(thread_id, []).append(name)
+
+        record = nullcontext()
+        if self._torch_active:
+            from torch.profiler import record_function
+            record = record_function(name)
+
+        start = time.perf_counter()
+        try:
+            with record:
+                yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                stack = self._active[thread_id]
+                stack.pop()
+                if not stack:
+                    del self._active[thread_id]
+                self._stage_totals[name] += elapsed
+            self._add_event(name, "stage", start, elapsed, thread_id)
+
+    def attach_module_timers(self, modules: dict):
+        """
+        给 torch 模块挂上前向计时钩子,如 {"encoder": model.encoder, "decoder": model.decoder}
+
+        GPU 上会在前向前后同步,使计时反映真实执行时间(仅在分析时有此开销)。
+        模块可能被其他任务共享(网络传输模式),只记录处于本任务某个阶段中的线程的调用。
+        """
+        if not self.enabled:
+            return
+        import torch
+        synchronize = torch.cuda.synchronize if torch.cuda.is_available() else (lambda: None)
+        starts = {}
+
+        for name, module in modules.items():
+            def pre_hook(mod, args, name=name):
+                thread_id = threading.get_ident()
+                if thread_id not in self._active:
+                    return
+                synchronize()
+                starts[(name, thread_id)] = time.perf_counter()
+
+            def post_hook(mod, args, output, name=name):
+                start = starts.pop((name, threading.get_ident()), None)
+                if start is None:
+                    return
+                synchronize()
+                elapsed = time.perf_counter() - start
+                with self._lock:
+                    self._module_totals[name] += elapsed
+                    self._module_calls[name] += 1
+                self._add_event(name, "module", start, elapsed, threading.get_ident())
+
+            self._hooks.append(module.register_forward_pre_hook(pre_hook))
+            self._hooks.append(module.register_forward_hook(post_hook))
+
+    def diarization_hook(self):
+        """
+        返回 pyannote pipeline 的 hook 回调,记录各步骤(segmentation / embeddings 等)耗时
+
+        每个步骤的耗时按"上一步骤最后一次回调"到"本步骤最后一次回调"计算,
+        最后一个步骤在 stop() 时结算。未启用时返回 None。
+        """
+        if not self.enabled:
+            return None
+        state = {"step": None, "step_start": time.perf_counter(), "last": time.perf_counter()}
+
+        def close_step():
+            if state["step"] is not None:
+                elapsed = state["last"] - state["step_start"]
+                name = f"diarization/{state['step']}"
+                with self._lock:
+                    self._stage_totals[name] += elapsed
+                self._add_event(name, "stage", state["step_start"], elapsed, threading.get_ident())
+                state["step_start"] = state["last"]
+
+        def hook(step_name, step_artifact, file=None, total=None, completed=None):
+            now = time.perf_counter()
+            if step_name != state["step"]:
+                close_step()
+                state["step"] = step_name
+            state["last"] = now
+
+        self._step_closers.append(close_step)
+        return hook
+
+    def stop(self) -> dict:
+        """停止分析,写出 trace / 折叠栈文件并在日志中输出热点汇总"""
+        if not self.enabled:
+            return {}
+
+        self._stop_sampling.set()
+        if self._sampler is not None:
+            self._sampler.join()
+        for handle in self._hooks:
+            handle.remove()
+        self._hooks = []
+        for close_step in self._step_closers:
+            close_step()
+        self._step_closers = []
+
+        trace_path = self.output_base.with_suffix('.trace.json')
+        collapsed_path = self.output_base.with_suffix('.collapsed.txt')
+        torch_table = None
+
+        if self._torch_profiler is not None:
+            try:
+                self._torch_profiler.export_chrome_trace(str(trace_path))
+                self._merge_trace(trace_path)
+                sort_by = "self_cuda_time_total" if self._has_cuda_activity() else "self_cpu_time_total"
+                torch_table = self._torch_profiler.key_averages().table(sort_by=sort_by, row_limit=10)
+            except Exception as e:
+                logger.warning(f"导出 torch.profiler 结果失败: {e}")
+                self._write_trace(trace_path)
+            finally:
+                self._torch_profiler = None
+        else:
+            self._write_trace(trace_path)
+
+        with open(collapsed_path, 'w', encoding='utf-8') as f:
+            for stack, count in self._samples.most_common():
+                f.write(f"{stack} {count}\n")
+
+        logger.info(self.summary())
+        if torch_table:
+            logger.info("torch 算子热点:\n" + torch_table)
+        logger.info(f"Chrome trace: {trace_path}")
+        logger.info(f"折叠栈: {collapsed_path}")
+        return {"trace": str(trace_path), "collapsed": str(collapsed_path)}
+
+    def summary(self, top: int = 10) -> str:
+        """阶段耗时、模块耗时和采样热点汇总"""
+        lines = ["=" * 60, "性能分析汇总", "=" * 60, "阶段耗时:"]
+        for name, total in sorted(self._stage_totals.items(), key=lambda item: -item[1]):
+            lines.append(f"  {name:<32} {total:10.2f} 秒")
+
+        if self._module_totals:
+            lines.append("模型前向耗时:")
+            for name, total in sorted(self._module_totals.items(), key=lambda item: -item[1]):
+                lines.append(f"  {name:<32} {total:10.2f} 秒  ({self._module_calls[name]} 次)")
+
+        total_samples = sum(self._samples.values())
+        if total_samples:
+            self_counts = Counter()
+            for stack, count in self._samples.items():
+                self_counts[stack.rsplit(";", 1)[-1]] += count
+            lines.append(f"采样热点 (自身时间, 共 {total_samples} 个样本):")
+            for frame, count in self_counts.most_common(top):
+                lines.append(f"  {count / total_samples:6.1%}  {frame}")
+
+        lines.append("=" * 60)
+        return "\n".join(lines)
+
+    def _add_event(self, name: str, category: str, start: float, elapsed: float, thread_id: int):
+        with self._lock:
+            if category == "module" and len(self._events) >= MAX_MODULE_EVENTS:
+                return
+            self._events.append({
+                "name": name,
+                "cat": category,
+                "ph": "X",
+                "ts": (start - self._origin) * 1e6,
+                "dur": elapsed * 1e6,
+                "pid": os.getpid(),
+                "tid": thread_id,
+            })
+
+    def _write_trace(self, path: Path):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({"traceEvents": self._events, "displayTimeUnit": "ms"}, f)
+
+    def _merge_trace(self, path: Path):
+        """
+        把阶段/模块/说话人分离事件合并进 torch.profiler 导出的 trace
+
+        两者的时间基准不同: 用同名阶段(stage() 同时写入 record_function 标记)对齐,
+        找不到时退回 trace 中的 baseTimeNanoseconds(torch 时间戳 = 墙钟 - 基准)。
+        """
+        with open(path, encoding='utf-8') as f:
+            trace = json.load(f)
+        torch_events = trace.setdefault("traceEvents", [])
+
+        # 每个阶段名取最早一次出现的开始时间
+        torch_marks, own_marks = {}, {}
+        for event in torch_events:
+            if event.get("cat") == "user_annotation" and "ts" in event:
+                torch_marks[event["name"]] = min(event["ts"], torch_marks.get(event["name"], event["ts"]))
+        for event in self._events:
+            if event["cat"] == "stage":
+                own_marks[event["name"]] = min(event["ts"], own_marks.get(event["name"], event["ts"]))
+
+        offset = None
+        for name, ts in sorted(own_marks.items(), key=lambda item: item[1]):
+            if name in torch_marks:
+                offset = torch_marks[name] - ts
+                break
+        if offset is None:
+            base_us = trace.get("baseTimeNanoseconds", 0) / 1000
+            offset = self._origin_wall * 1e6 - base_us
+
+        for event in self._events:
+            torch_events.append({**event, "ts": event["ts"] + offset})
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(trace, f)
+
+    def _has_cuda_activity(self) -> bool:
+        try:
+            import torch
+            return torch.cuda.is_available()
+        except ImportError:
+            return False
+
+    def _sample_loop(self):
+        """定期采样处于某个阶段中的线程的调用栈"""
+        while not self._stop_sampling.wait(self.sample_interval):
+            frames = sys._current_frames()
+            with self._lock:
+                active = {tid: list(stages) for tid, stages in self._active.items()}
+            for thread_id, stages in active.items():
+                frame = frames.get(thread_id)
+                if frame is None:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({Path(code.co_filename).name}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                key = ";".join(stages + stack[::-1])
+                self._samples[key] += 1
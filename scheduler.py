@@ -0,0 +1,193 @@
+"""
+转录任务调度
+按优先级排队,并根据预估内存占用做准入控制,避免同时运行过多任务导致内存耗尽
+"""
+import os
+import heapq
+import asyncio
+import logging
+import itertools
+import uuid
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# 优先级(数值越小越优先)
+PRIORITY_INTERACTIVE = 0  # 短音频,客户端同步等待结果
+PRIORITY_BATCH = 1        # 长音频,在独立进程中处理
+
+GB = 1024 ** 3
+
+# 内存估算参数
+SAMPLE_RATE = 16000
+BYTES_PER_SAMPLE = 4          # float32
+# 进程私有的音频副本数(Whisper 填充和特征、pyannote 批次);解码后的样本通过 PCM 缓存
+# 内存映射共享,位于可回收的页缓存中,不计入
+AUDIO_COPIES = 2
+WHISPER_MODEL_MEMORY = 3 * GB
+DIARIZATION_MODEL_MEMORY = 1 * GB
+
+# 保留的已结束任务记录数
+FINISHED_HISTORY = 100
+
+
+def default_memory_budget() -> int:
+    """默认内存预算: 环境变量 STT_MEMORY_BUDGET_GB,否则取物理内存的 80%(无法获取时为 16 GB)"""
+    configured = os.environ.get("STT_MEMORY_BUDGET_GB")
+    if configured:
+        return int(float(configured) * GB)
+    try:
+        return int(os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES") * 0.8)
+    except (AttributeError, ValueError, OSError):
+        return 16 * GB
+
+
+def estimate_job_memory(duration_seconds: float, separate_process: bool, enable_diarization: bool) -> int:
+    """
+    预估单个任务的内存占用(字节)
+
+    音频部分为 时长 × 采样率 × 每样本字节数 × 副本数;
+    独立进程需要自己加载模型,另加模型内存。服务器进程中常驻的模型不计入。
+    """
+    memory = int(duration_seconds * SAMPLE_RATE * BYTES_PER_SAMPLE * AUDIO_COPIES)
+    if separate_process:
+        memory += WHISPER_MODEL_MEMORY
+        if enable_diarization:
+            memory += DIARIZATION_MODEL_MEMORY
+    return memory
+
+
+class Job:
+    """一个调度中的任务"""
+
+    def __init__(self, name: str, priority: int, memory: int):
+        self.job_id = uuid.uuid4().hex[:12]
+        self.name = name
+        self.priority = priority
+        self.memory = memory
+        self.state = "queued"  # queued / running / done / failed / cancelled
+        self.error = None
+        self.submitted_at = datetime.now()
+        self.started_at = None
+        self.finished_at = None
+        self.seq = 0
+        self.admitted = asyncio.Event()
+
+
+class JobScheduler:
+    """
+    优先级 + 内存预算调度器
+
+    队首任务(优先级最高、提交最早)在 常驻内存 + 已用内存 + 预估内存 ≤ 预算 时被准入;
+    常驻内存是服务器进程自身加载的模型等(见 reserve),不随任务释放。
+    没有任务运行时即使超出预算也准入,避免大任务永远无法执行。
+    队首任务放不下时后面的任务也等待,防止小任务不断插队使大任务饿死。
+    """
+
+    def __init__(self, memory_budget: Optional[int] = None):
+        self.memory_budget = memory_budget or default_memory_budget()
+        self.memory_used = 0
+        self.reserved = {}  # 常驻内存 {名称: 字节数}
+        self.jobs = {}
+        self._queue = []
+        self._running = set()
+        self._seq = itertools.count()
+
+    def submit(self, name: str, priority: int, memory: int) -> Job:
+        """提交任务,返回 Job(可能已被立即准入)"""
+        job = Job(name, priority, memory)
+        job.seq = next(self._seq)
+        self.jobs[job.job_id] = job
+        heapq.heappush(self._queue, (priority, job.seq, job))
+        logger.info(
+            f"任务 {job.job_id} 已提交: {name}, 优先级 {priority}, "
+            f"预估内存 {memory / GB:.2f} GB"
+        )
+        self._dispatch()
+        return job
+
+    def release(self, job: Job, error: Optional[str] = None):
+        """任务结束,释放其内存额度"""
+        if job in self._running:
+            self._running.discard(job)
+            self.memory_used -= job.memory
+            job.state = "failed" if error else "done"
+        else:
+            self._remove_queued(job)
+            job.state = "cancelled"
+        job.error = error
+        job.finished_at = datetime.now()
+        self._prune()
+        self._dispatch()
+
+    @property
+    def memory_reserved(self) -> int:
+        return sum(self.reserved.values())
+
+    def reserve(self, name: str, memory: int):
+        """
+        登记服务器进程中常驻的内存(如已加载的模型),从预算中扣除
+
+        同一名称重复登记时覆盖。预算只会因此变小,不需要重新调度。
+        """
+        self.reserved[name] = memory
+        logger.info(
+            f"常驻内存 {name}: {memory / GB:.2f} GB, "
+            f"可分配给任务的预算 {(self.memory_budget - self.memory_reserved) / GB:.2f} GB"
+        )
+
+    def position(self, job: Job) -> int:
+        """排队位置(从 1 开始),未在排队时返回 0"""
+        if job.state != "queued":
+            return 0
+        key = (job.priority, job.seq)
+        return 1 + sum(1 for priority, seq, _ in self._queue if (priority, seq) < key)
+
+    @asynccontextmanager
+    async def run(self, name: str, priority: int, memory: int):
+        """提交任务并等待准入,退出上下文时释放"""
+        job = self.submit(name, priority, memory)
+        try:
+            await job.admitted.wait()
+            yield job
+        except BaseException as e:
+            self.release(job, error=str(e) or type(e).__name__)
+            raise
+        else:
+            self.release(job)
+
+    def status(self) -> dict:
+        return {
+            "memory_budget_gb": round(self.memory_budget / GB, 2),
+            "memory_used_gb": round(self.memory_used / GB, 2),
+            "memory_reserved_gb": round(self.memory_reserved / GB, 2),
+            "running": len(self._running),
+            "queued": len(self._queue),
+        }
+
+    def _dispatch(self):
+        while self._queue:
+            _, _, job = self._queue[0]
+            if self._running and self.memory_reserved + self.memory_used + job.memory > self.memory_budget:
+                break
+            heapq.heappop(self._queue)
+            self._running.add(job)
+            self.memory_used += job.memory
+            job.state = "running"
+            job.started_at = datetime.now()
+            job.admitted.set()
+            logger.info(
+                f"任务 {job.job_id} 开始运行, 内存 {(self.memory_reserved + self.memory_used) / GB:.2f}"
+                f"/{self.memory_budget / GB:.2f} GB"
+            )
+
+    def _remove_queued(self, job: Job):
+        self._queue = [item for item in self._queue if item[2] is not job]
+        heapq.heapify(self._queue)
+
+    def _prune(self):
+        finished = [job for job in self.jobs.values() if job.finished_at is not None]
+        for job in sorted(finished, key=lambda j: j.finished_at)[:-FINISHED_HISTORY]:
+            del self.jobs[job.job_id]
@@ -6,13 +6,17 @@ Speech-to-Text MCP Server
 
 import os
 import sys
+import hmac
+import time
 import logging
 from pathlib import Path
-from typing import Optional
+from typing import Optional, Union
 import asyncio
 import threading
 from datetime import datetime
 
+import numpy as np
+
 # 设置 FFmpeg 路径
 if os.name == 'nt':  # Windows
     ffmpeg_path = r"C:\ProgramData\chocolatey\bin"
@@ -28,6 +32,22 @@ import whisper
 import torch
 import subprocess
 import tempfile
+import base64
+
+from audio_stream import StreamSession, STREAM_FORMATS
+from concurrency import FairRequestLimiter
+import transcript_store
+import pcm_cache
+from profiling import JobProfiler, TORCH_PROFILE_MAX_SECONDS
+from scheduler import (
+    JobScheduler,
+    PRIORITY_INTERACTIVE,
+    PRIORITY_BATCH,
+    GB,
+    WHISPER_MODEL_MEMORY,
+    DIARIZATION_MODEL_MEMORY,
+    estimate_job_memory,
+)
 
 # 延迟导入 pyannote.audio 以避免依赖冲突
 # from pyannote.audio import Pipeline
@@ -42,13 +62,53 @@ logger = logging.getLogger(__name__)
 # 初始化 MCP Server
 app = Server("speech-to-text-server")
 
-# 全局变量存储模型
+# 全局变量存储模型(网络传输模式下由所有客户端共享)
 WHISPER_MODEL = None
 DIARIZATION_PIPELINE = None
+MODEL_INIT_LOCK = threading.Lock()
+
+# 推理锁: 共享的模型实例不能并发推理(Whisper 解码时会在共享的 decoder 上注册 KV 缓存钩子,
+# 并发解码会互相覆盖缓存)。同一进程内的转录/流式窗口按顺序使用 Whisper,
+# 说话人分离使用单独的锁,可以与另一个请求的转录重叠;长音频在独立进程中运行,不受影响
+WHISPER_INFERENCE_LOCK = threading.Lock()
+DIARIZATION_INFERENCE_LOCK = threading.Lock()
+
+# 词落在说话人语音段之间的间隙中时,归属距离不超过该值(秒)的最近语音段
+WORD_SPEAKER_TOLERANCE = 1.0
 
 # 全局线程池,用于跟踪后台任务
 BACKGROUND_THREADS = []
 
+# 进行中的流式转录会话 {session_id: StreamSession},只有创建会话的客户端可以访问
+STREAM_SESSIONS = {}
+MAX_STREAM_SESSIONS = 8
+
+# 超过该时间(秒)没有推送的会话会被关闭(如客户端断开后遗留的会话),每隔 STREAM_REAP_INTERVAL 秒检查一次
+STREAM_IDLE_TIMEOUT = 300
+STREAM_REAP_INTERVAL = 30
+
+# 耗时工具调用的并发限制(总并发数 / 每个客户端并发数),可通过命令行参数调整
+REQUEST_LIMITER = FairRequestLimiter(max_concurrent=2, per_client=1)
+LIMITED_TOOLS = {"transcribe_audio", "push_audio_chunk", "finish_stream"}
+
+# 转录任务调度器: 短音频优先,按内存预算准入(预算可通过 STT_MEMORY_BUDGET_GB 或 --memory-budget-gb 设置)
+JOB_SCHEDULER = JobScheduler()
+
+# 等待调度/运行中的独立进程任务,保持引用避免被垃圾回收
+BACKGROUND_TASKS = set()
+
+# 检查独立进程是否退出的间隔(秒)
+PROCESS_POLL_INTERVAL = 1.0
+
+# 长音频独立进程执行的脚本
+STANDALONE_SCRIPT = Path(__file__).parent / "standalone_transcribe.py"
+
+# 无需访问令牌即可监听的本机地址
+LOOPBACK_HOSTS = {"127.0.0.1", "localhost", "::1"}
+
+# 解码后的 PCM 音频缓存(按内容寻址,转录和说话人分离共享同一份内存映射)
+PCM_CACHE = pcm_cache.PCMCache()
+
 # 支持的音频格式
 SUPPORTED_FORMATS = [
     "mp3", "wav", "m4a", "flac", "ogg", "wma", 
@@ -59,47 +119,52 @@ SUPPORTED_FORMATS = [
 def initialize_whisper_model(model_size: str = "medium"):
     """初始化 Whisper 模型"""
     global WHISPER_MODEL
-    if WHISPER_MODEL is None:
-        logger.info(f"正在加载 Whisper {model_size} 模型...")
-        device = "cuda" if torch.cuda.is_available() else "cpu"
-        WHISPER_MODEL = whisper.load_model(model_size, device=device)
-        logger.info(f"Whisper 模型已加载到 {device}")
+    with MODEL_INIT_LOCK:
+        if WHISPER_MODEL is None:
+            # 模型常驻服务器进程,先从调度器预算中扣除,避免按整个预算准入长音频任务
+            JOB_SCHEDULER.reserve("whisper", WHISPER_MODEL_MEMORY)
+            logger.info(f"正在加载 Whisper {model_size} 模型...")
+            device = "cuda" if torch.cuda.is_available() else "cpu"
+            WHISPER_MODEL = whisper.load_model(model_size, device=device)
+            logger.info(f"Whisper 模型已加载到 {device}")
     return WHISPER_MODEL
 
 
 def initialize_diarization_pipeline():
     """初始化说话人分离管道"""
     global DIARIZATION_PIPELINE
-    if DIARIZATION_PIPELINE is None:
-        # 延迟导入 pyannote.audio 以避免启动时的依赖冲突
-        try:
-            from pyannote.audio import Pipeline
-        except ImportError as e:
-            raise ImportError(
-                "无法导入 pyannote.audio。请确保已安装所有依赖:\n"
-                "pip install pyannote.audio torch torchvision torchaudio --upgrade\n"
-                f"错误详情: {str(e)}"
-            )
-        
-        hf_token = os.environ.get("HUGGINGFACE_TOKEN")
-        if not hf_token:
-            raise ValueError(
-                "需要设置 HUGGINGFACE_TOKEN 环境变量来使用说话人分离功能。\n"
-                "请访问 https://huggingface.co/settings/tokens 获取 token"
+    with MODEL_INIT_LOCK:
+        if DIARIZATION_PIPELINE is None:
+            # 延迟导入 pyannote.audio 以避免启动时的依赖冲突
+            try:
+                from pyannote.audio import Pipeline
+            except ImportError as e:
+                raise ImportError(
+                    "无法导入 pyannote.audio。请确保已安装所有依赖:\n"
+                    "pip install pyannote.audio torch torchvision torchaudio --upgrade\n"
+                    f"错误详情: {str(e)}"
+                )
+            
+            hf_token = os.environ.get("HUGGINGFACE_TOKEN")
+            if not hf_token:
+                raise ValueError(
+                    "需要设置 HUGGINGFACE_TOKEN 环境变量来使用说话人分离功能。\n"
+                    "请访问 https://huggingface.co/settings/tokens 获取 token"
+                )
+            
+            JOB_SCHEDULER.reserve("diarization", DIARIZATION_MODEL_MEMORY)
+            logger.info("正在加载说话人分离模型...")
+            DIARIZATION_PIPELINE = Pipeline.from_pretrained(
+                "pyannote/speaker-diarization-3.1",
+                use_auth_token=hf_token
             )
-        
-        logger.info("正在加载说话人分离模型...")
-        DIARIZATION_PIPELINE = Pipeline.from_pretrained(
-            "pyannote/speaker-diarization-3.1",
-            use_auth_token=hf_token
-        )
-        
-        # 如果有 GPU,使用 GPU
-        if torch.cuda.is_available():
-            DIARIZATION_PIPELINE.to(torch.device("cuda"))
-            logger.info("说话人分离模型已加载到 GPU")
-        else:
-            logger.info("说话人分离模型已加载到 CPU")
+            
+            # 如果有 GPU,使用 GPU
+            if torch.cuda.is_available():
+                DIARIZATION_PIPELINE.to(torch.device("cuda"))
+                logger.info("说话人分离模型已加载到 GPU")
+            else:
+                logger.info("说话人分离模型已加载到 CPU")
     
     return DIARIZATION_PIPELINE
 
@@ -138,6 +203,16 @@ def convert_to_wav(audio_path: str) -> str:
         raise RuntimeError(f"音频转换失败: {e}")
 
 
+def load_pcm(audio_path: str) -> np.ndarray:
+    """
+    获取音频的 16 kHz 单声道 float32 样本
+    
+    首次使用时解码到 PCM 缓存,之后(包括其他进程)直接内存映射缓存文件,不再重复解码。
+    返回的数组可直接传给 Whisper 和 pyannote,切片不会复制数据。
+    """
+    return pcm_cache.open_pcm(PCM_CACHE.get(audio_path))
+
+
 def get_audio_duration(audio_path: str) -> float:
     """获取音频时长(秒)"""
     try:
@@ -162,11 +237,24 @@ def format_timestamp(seconds: float) -> str:
     return f"{hours:02d}:{minutes:02d}:{secs:06.3f}"
 
 
-def transcribe_with_whisper(audio_path: str, language: Optional[str] = None) -> dict:
-    """使用 Whisper 进行语音识别"""
+def transcribe_with_whisper(
+    audio: Union[str, np.ndarray],
+    language: Optional[str] = None,
+    word_timestamps: bool = False
+) -> dict:
+    """
+    使用 Whisper 进行语音识别
+    
+    audio 可以是音频文件路径,也可以是 16 kHz 单声道 float32 样本(见 load_pcm)。
+    word_timestamps 为 True 时启用词级时间戳,词级数据会被转换为列式
+    NumPy 数组存放在 result["words"] 中(见 extract_word_arrays)。
+    """
     model = initialize_whisper_model()
     
-    logger.info(f"开始转录音频: {audio_path}")
+    if isinstance(audio, np.ndarray):
+        logger.info(f"开始转录音频: {len(audio) / pcm_cache.SAMPLE_RATE:.1f} 秒 PCM 样本")
+    else:
+        logger.info(f"开始转录音频: {audio}")
     
     # 转录参数
     transcribe_options = {
@@ -177,29 +265,93 @@ def transcribe_with_whisper(audio_path: str, language: Optional[str] = None) ->
     if language:
         transcribe_options["language"] = language
     
+    if word_timestamps:
+        transcribe_options["word_timestamps"] = True
+    
     # 执行转录
-    result = model.transcribe(audio_path, **transcribe_options)
+    with WHISPER_INFERENCE_LOCK:
+        result = model.transcribe(audio, **transcribe_options)
+    
+    if word_timestamps:
+        result["words"] = extract_word_arrays(result)
+        logger.info(f"词级时间戳: 共 {len(result['words']['start'])} 个词")
     
     logger.info("转录完成")
     return result
 
 
-def perform_diarization(audio_path: str) -> dict:
-    """执行说话人分离"""
+def extract_word_arrays(transcription: dict) -> dict:
+    """
+    将 Whisper 每个片段中的词级结果(字典列表)转换为列式数组
+    
+    返回的字典包含:
+        text: 词文本列表
+        start / end: 词起止时间(秒, float32)
+        probability: 词置信度(float32)
+        segment: 词所属的原始片段序号(int32)
+    
+    转换后会删除片段中的 "words" 列表,避免同一份数据存两遍。
+    """
+    segments = transcription.get("segments", [])
+    count = sum(len(seg.get("words", ())) for seg in segments)
+    
+    text = []
+    start = np.empty(count, dtype=np.float32)
+    end = np.empty(count, dtype=np.float32)
+    probability = np.empty(count, dtype=np.float32)
+    segment = np.empty(count, dtype=np.int32)
+    
+    i = 0
+    for seg_index, seg in enumerate(segments):
+        for word in seg.pop("words", ()):
+            text.append(word["word"])
+            start[i] = word["start"]
+            end[i] = word["end"]
+            probability[i] = word.get("probability", np.nan)
+            segment[i] = seg_index
+            i += 1
+    
+    return {
+        "text": text,
+        "start": start,
+        "end": end,
+        "probability": probability,
+        "segment": segment,
+    }
+
+
+def perform_diarization(audio: Union[str, np.ndarray], hook=None) -> dict:
+    """
+    执行说话人分离
+    
+    audio 可以是音频文件路径,也可以是 16 kHz 单声道 float32 样本(见 load_pcm),
+    后者以张量形式直接交给 pyannote,不再重新读取文件。
+    hook 会传给 pyannote pipeline,用于获取各步骤的进度(如性能分析)。
+    """
     import time
     pipeline = initialize_diarization_pipeline()
     
     logger.info("开始说话人分离分析...")
-    logger.info(f"音频文件: {audio_path}")
-    
-    # 确保音频是WAV格式（pyannote对WAV格式处理更稳定）
-    if not audio_path.lower().endswith('.wav'):
-        logger.info("转换音频为WAV格式以提高兼容性...")
-        audio_path = convert_to_wav(audio_path)
-        logger.info(f"已转换为: {audio_path}")
     
-    # 获取音频时长用于进度估算
-    duration = get_audio_duration(audio_path)
+    if isinstance(audio, np.ndarray):
+        # torch.from_numpy 与内存映射共享数据,不复制
+        audio_input = {
+            "waveform": torch.from_numpy(audio).unsqueeze(0),
+            "sample_rate": pcm_cache.SAMPLE_RATE,
+        }
+        duration = len(audio) / pcm_cache.SAMPLE_RATE
+    else:
+        logger.info(f"音频文件: {audio}")
+        
+        # 确保音频是WAV格式（pyannote对WAV格式处理更稳定）
+        audio_input = audio
+        if not audio.lower().endswith('.wav'):
+            logger.info("转换音频为WAV格式以提高兼容性...")
+            audio_input = convert_to_wav(audio)
+            logger.info(f"已转换为: {audio_input}")
+        
+        # 获取音频时长用于进度估算
+        duration = get_audio_duration(audio_input)
     logger.info(f"音频时长: {duration:.1f} 秒")
     
     # 执行分离（这一步可能需要很长时间）
@@ -209,7 +361,8 @@ def perform_diarization(audio_path: str) -> dict:
     try:
         # 对于长音频，pyannote可能会有tensor size不匹配的问题
         # 使用更小的batch size
-        diarization = pipeline(audio_path)
+        with DIARIZATION_INFERENCE_LOCK:
+            diarization = pipeline(audio_input, hook=hook) if hook else pipeline(audio_input)
         elapsed = time.time() - start_time
         logger.info(f"说话人分离完成，耗时: {elapsed:.1f} 秒")
     except RuntimeError as e:
@@ -220,7 +373,8 @@ def perform_diarization(audio_path: str) -> dict:
             global DIARIZATION_PIPELINE
             DIARIZATION_PIPELINE = None
             pipeline = initialize_diarization_pipeline()
-            diarization = pipeline(audio_path)
+            with DIARIZATION_INFERENCE_LOCK:
+                diarization = pipeline(audio_input, hook=hook) if hook else pipeline(audio_input)
             elapsed = time.time() - start_time
             logger.info(f"说话人分离完成（备用方法），耗时: {elapsed:.1f} 秒")
         else:
@@ -244,6 +398,15 @@ def perform_diarization(audio_path: str) -> dict:
     return speakers_timeline
 
 
+def find_segment_speaker(start_time: float, diarization: list) -> str:
+    """返回片段开始时间所在语音段的说话人"""
+    for dia in diarization:
+        # 如果转录片段的开始时间在说话人时间段内
+        if dia["start"] <= start_time <= dia["end"]:
+            return dia["speaker"]
+    return "UNKNOWN"
+
+
 def merge_transcription_with_diarization(transcription: dict, diarization: list) -> str:
     """将转录结果与说话人分离结果合并"""
     segments = transcription.get("segments", [])
@@ -256,12 +419,7 @@ def merge_transcription_with_diarization(transcription: dict, diarization: list)
         text = segment["text"].strip()
         
         # 找到对应的说话人
-        speaker = "UNKNOWN"
-        for dia in diarization:
-            # 如果转录片段的开始时间在说话人时间段内
-            if dia["start"] <= start_time <= dia["end"]:
-                speaker = dia["speaker"]
-                break
+        speaker = find_segment_speaker(start_time, diarization)
         
         # 格式化输出
         timestamp = f"[{format_timestamp(start_time)} --> {format_timestamp(end_time)}]"
@@ -271,6 +429,223 @@ def merge_transcription_with_diarization(transcription: dict, diarization: list)
     return "\n".join(result_lines)
 
 
+def assign_speakers_to_words(words: dict, diarization: list) -> np.ndarray:
+    """
+    为每个词分配说话人
+    
+    以词的中点时间在说话人时间线上做向量化查找(searchsorted):
+    取中点之前最近开始的语音段,若中点落在该段内则归属该说话人;
+    否则(语音段重叠时)改用此前结束最晚的语音段。
+    中点不在任何语音段内(停顿间隙、第一个语音段之前)时,归属前后两侧中较近的语音段,
+    距离超过 WORD_SPEAKER_TOLERANCE 才记为 UNKNOWN,避免同一说话人的连续片段被间隙中的词打断。
+    
+    Returns:
+        与 words["start"] 等长的说话人标签数组
+    """
+    num_words = len(words["start"])
+    if num_words == 0 or not diarization:
+        return np.full(num_words, "UNKNOWN", dtype=object)
+    
+    turns = sorted(diarization, key=lambda item: item["start"])
+    num_turns = len(turns)
+    turn_start = np.fromiter((t["start"] for t in turns), dtype=np.float64, count=num_turns)
+    turn_end = np.fromiter((t["end"] for t in turns), dtype=np.float64, count=num_turns)
+    turn_speaker = np.array([t["speaker"] for t in turns] + ["UNKNOWN"], dtype=object)
+    
+    midpoint = (words["start"].astype(np.float64) + words["end"]) / 2
+    index = np.searchsorted(turn_start, midpoint, side="right") - 1
+    
+    # 截至每个语音段为止结束最晚的语音段序号,用于处理重叠的语音段
+    positions = np.arange(num_turns)
+    latest_end = np.maximum.accumulate(
+        np.where(turn_end == np.maximum.accumulate(turn_end), positions, 0)
+    )
+    
+    has_previous = index >= 0
+    own = np.maximum(index, 0)
+    previous = latest_end[own]
+    in_own = has_previous & (midpoint <= turn_end[own])
+    in_previous = has_previous & (midpoint <= turn_end[previous])
+    
+    # 间隙中的词: 与之前结束最晚的语音段、之后第一个语音段的距离
+    following = np.minimum(index + 1, num_turns - 1)
+    distance_before = np.where(has_previous, midpoint - turn_end[previous], np.inf)
+    distance_after = np.where(index + 1 < num_turns, turn_start[following] - midpoint, np.inf)
+    nearest = np.where(distance_after < distance_before, following, previous)
+    # 超出容差的词指向末尾的 UNKNOWN 标签
+    nearest[np.minimum(distance_before, distance_after) > WORD_SPEAKER_TOLERANCE] = num_turns
+    
+    index = np.where(in_own, own, np.where(in_previous, previous, nearest))
+    return turn_speaker[index]
+
+
+def split_words_by_speaker(words: dict, speakers: np.ndarray) -> list:
+    """
+    按说话人切换点重新切分片段
+    
+    在原始片段边界和说话人变化处断开,返回
+    [{"start", "end", "speaker", "text"}, ...]
+    """
+    num_words = len(words["start"])
+    if num_words == 0:
+        return []
+    
+    changed = np.empty(num_words, dtype=bool)
+    changed[0] = True
+    changed[1:] = (speakers[1:] != speakers[:-1]) | (words["segment"][1:] != words["segment"][:-1])
+    
+    bounds = np.append(np.flatnonzero(changed), num_words)
+    
+    segments = []
+    for first, last in zip(bounds[:-1], bounds[1:]):
+        segments.append({
+            "start": float(words["start"][first]),
+            "end": float(words["end"][last - 1]),
+            "speaker": speakers[first],
+            "text": "".join(words["text"][first:last]).strip(),
+        })
+    return segments
+
+
+def merge_words_with_diarization(transcription: dict, diarization: list) -> str:
+    """将词级转录结果与说话人分离结果合并(在说话人切换处拆分片段)"""
+    words = transcription.get("words")
+    if words is None or len(words["start"]) == 0:
+        # 没有词级数据时退回片段级合并
+        return merge_transcription_with_diarization(transcription, diarization)
+    
+    speakers = assign_speakers_to_words(words, diarization)
+    
+    result_lines = []
+    for segment in split_words_by_speaker(words, speakers):
+        if not segment["text"]:
+            continue
+        timestamp = f"[{format_timestamp(segment['start'])} --> {format_timestamp(segment['end'])}]"
+        line = f"[说话人 {segment['speaker']}] {timestamp}\n{segment['text']}\n"
+        result_lines.append(line)
+    
+    return "\n".join(result_lines)
+
+
+def transcribe_pcm_window(audio: np.ndarray, language: Optional[str], prompt: Optional[str]) -> dict:
+    """对流式会话中的一段 16 kHz float32 音频执行 Whisper 转录"""
+    model = initialize_whisper_model()
+    
+    transcribe_options = {
+        "task": "transcribe",
+        "verbose": None,
+        "condition_on_previous_text": False,
+        "fp16": torch.cuda.is_available(),
+    }
+    if language:
+        transcribe_options["language"] = language
+    if prompt:
+        transcribe_options["initial_prompt"] = prompt
+    
+    with WHISPER_INFERENCE_LOCK:
+        return model.transcribe(audio, **transcribe_options)
+
+
+def get_stream_session(session_id: Optional[str]) -> Optional[StreamSession]:
+    """返回当前客户端的流式会话,会话不存在或属于其他客户端时返回 None"""
+    session = STREAM_SESSIONS.get(session_id)
+    if session is None or session.owner is not current_client():
+        return None
+    return session
+
+
+def reap_idle_stream_sessions() -> int:
+    """关闭空闲超时的流式会话,释放 ffmpeg 进程和会话名额"""
+    now = time.monotonic()
+    idle = [
+        session_id for session_id, session in STREAM_SESSIONS.items()
+        if now - session.last_active > STREAM_IDLE_TIMEOUT
+    ]
+    for session_id in idle:
+        session = STREAM_SESSIONS.pop(session_id)
+        session.close()
+        logger.warning(f"流式会话空闲超时,已关闭: {session_id} (已接收 {session.duration:.1f} 秒)")
+    return len(idle)
+
+
+async def reap_stream_sessions_periodically():
+    """定期清理空闲的流式会话"""
+    while True:
+        await asyncio.sleep(STREAM_REAP_INTERVAL)
+        reap_idle_stream_sessions()
+
+
+def format_stream_status(session: StreamSession) -> str:
+    """格式化流式会话的当前结果(已确认片段 + 临时片段)"""
+    lines = [
+        f"🎙️ 流会话: {session.session_id}",
+        f"⏱️ 已接收: {session.duration:.1f} 秒",
+        "",
+    ]
+    for segment in session.committed:
+        timestamp = f"[{format_timestamp(segment['start'])} --> {format_timestamp(segment['end'])}]"
+        lines.append(f"{timestamp} {segment['text'].strip()}")
+    for segment in session.tentative:
+        timestamp = f"[{format_timestamp(segment['start'])} --> {format_timestamp(segment['end'])}]"
+        lines.append(f"{timestamp} (临时) {segment['text'].strip()}")
+    return "\n".join(lines)
+
+
+def collect_segments(transcription: dict, diarization: Optional[list] = None) -> list:
+    """
+    整理出带说话人的片段列表 [{"start", "end", "speaker", "text"}, ...]
+    
+    与输出文本的合并规则一致: 有词级数据时按词分配说话人并在切换处拆分,
+    否则按片段开始时间分配;未做说话人分离时 speaker 为 None。
+    """
+    words = transcription.get("words")
+    if diarization is not None and words is not None and len(words["start"]) > 0:
+        return split_words_by_speaker(words, assign_speakers_to_words(words, diarization))
+    
+    return [
+        {
+            "start": segment["start"],
+            "end": segment["end"],
+            "speaker": find_segment_speaker(segment["start"], diarization) if diarization is not None else None,
+            "text": segment["text"].strip(),
+        }
+        for segment in transcription.get("segments", [])
+    ]
+
+
+def save_to_transcript_store(
+    audio_file_path: str,
+    transcription: dict,
+    diarization: Optional[list],
+    duration: Optional[float]
+):
+    """把转录结果写入索引库,失败时只记录警告,不影响转录结果"""
+    try:
+        transcript_store.index_transcript(
+            audio_file_path,
+            collect_segments(transcription, diarization),
+            language=transcription.get("language"),
+            duration=duration
+        )
+    except Exception as e:
+        logger.warning(f"写入转录索引失败: {e}")
+
+
+def format_search_results(results: list) -> str:
+    """格式化 search_transcripts 的查询结果"""
+    if not results:
+        return "未找到匹配的转录片段"
+    
+    lines = [f"找到 {len(results)} 个片段:", ""]
+    for row in results:
+        timestamp = f"[{format_timestamp(row['start'])} --> {format_timestamp(row['end'])}]"
+        speaker = f" [说话人 {row['speaker']}]" if row["speaker"] else ""
+        lines.append(f"📁 {Path(row['file']).name}{speaker} {timestamp}")
+        lines.append(row["text"])
+        lines.append("")
+    return "\n".join(lines)
+
+
 def format_simple_transcription(transcription: dict) -> str:
     """格式化简单转录结果(无说话人分离)"""
     segments = transcription.get("segments", [])
@@ -288,12 +663,105 @@ def format_simple_transcription(transcription: dict) -> str:
     return "\n".join(result_lines)
 
 
+def build_result_header(
+    audio_file_path: str,
+    duration_minutes: float,
+    detected_language: str,
+    enable_diarization: bool,
+    num_speakers: int
+) -> str:
+    """生成转录结果文件的元信息头"""
+    header = f"{'='*60}\n"
+    header += f"语音转录结果\n"
+    header += f"{'='*60}\n\n"
+    header += f"📁 文件: {Path(audio_file_path).name}\n"
+    header += f"⏱️ 时长: {duration_minutes:.1f} 分钟\n"
+    header += f"🌐 语言: {detected_language}\n"
+    header += f"👥 说话人分离: {'已启用' if enable_diarization else '未启用'}\n"
+    if enable_diarization and num_speakers > 0:
+        header += f"🎤 识别说话人数: {num_speakers} 位\n"
+    header += f"📅 转录时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n"
+    header += f"\n{'='*60}\n\n"
+    return header
+
+
+def run_pipeline(
+    audio_file_path: str,
+    language: Optional[str],
+    enable_diarization: bool,
+    word_timestamps: bool,
+    duration: float,
+    profiler: Optional[JobProfiler] = None
+) -> str:
+    """
+    完整的转录流水线: 解码到 PCM 缓存 → Whisper 转录 → 说话人分离 → 合并 → 写入索引库
+    
+    profiler 不为空时各阶段会被计时和采样;启用 torch 算子记录时,
+    torch.profiler 在调用本函数的线程中启动和停止。
+    
+    Returns:
+        带元信息头的完整结果文本
+    """
+    profiler = profiler or JobProfiler(Path(audio_file_path), enabled=False)
+    
+    # torch.profiler 只记录启动它的线程,必须在执行流水线的线程中启动
+    with profiler.torch_scope():
+        # 解码到 PCM 缓存并内存映射(缓存命中时不解码)
+        with profiler.stage("ffmpeg_decode"):
+            audio = load_pcm(audio_file_path)
+        
+        # 加载模型(已加载时直接返回),并对编码器/解码器前向计时
+        with profiler.stage("model_load"):
+            model = initialize_whisper_model()
+        profiler.attach_module_timers({"encoder": model.encoder, "decoder": model.decoder})
+        
+        # 执行转录
+        with profiler.stage("transcribe"):
+            transcription = transcribe_with_whisper(audio, language, word_timestamps)
+        logger.info(f"转录完成,片段数: {len(transcription.get('segments', []))}")
+        
+        # 如果启用说话人分离
+        num_speakers = 0
+        diarization = None
+        if enable_diarization:
+            with profiler.stage("diarization_model_load"):
+                initialize_diarization_pipeline()
+            with profiler.stage("diarization"):
+                diarization = perform_diarization(audio, hook=profiler.diarization_hook())
+            num_speakers = len(set(seg["speaker"] for seg in diarization))
+            logger.info(f"说话人分离完成,识别 {num_speakers} 位说话人")
+        
+        with profiler.stage("merge"):
+            if diarization is None:
+                result_text = format_simple_transcription(transcription)
+            elif word_timestamps:
+                result_text = merge_words_with_diarization(transcription, diarization)
+            else:
+                result_text = merge_transcription_with_diarization(transcription, diarization)
+        
+        # 写入转录索引库
+        with profiler.stage("index"):
+            save_to_transcript_store(audio_file_path, transcription, diarization, duration)
+        
+        # 添加元信息
+        header = build_result_header(
+            audio_file_path,
+            duration / 60,
+            transcription.get("language", "unknown"),
+            enable_diarization,
+            num_speakers
+        )
+        return header + result_text
+
+
 def process_audio_in_background(
     audio_file_path: str,
     output_path: Path,
     language: Optional[str],
     enable_diarization: bool,
-    duration_minutes: float
+    duration_minutes: float,
+    word_timestamps: bool = False,
+    profile: bool = False
 ):
     """后台处理长音频文件并保存到文件"""
     
@@ -318,36 +786,19 @@ def process_audio_in_background(
     try:
         logger.info(f"🔄 开始转录处理...")
         
-        # 转换为 WAV 格式
-        wav_path = convert_to_wav(audio_file_path)
-        
-        # 执行转录
-        transcription = transcribe_with_whisper(wav_path, language)
-        
-        # 如果启用说话人分离
-        num_speakers = 0
-        if enable_diarization:
-            diarization = perform_diarization(wav_path)
-            result_text = merge_transcription_with_diarization(transcription, diarization)
-            num_speakers = len(set(seg["speaker"] for seg in diarization))
-        else:
-            result_text = format_simple_transcription(transcription)
-        
-        # 添加元信息
-        detected_language = transcription.get("language", "unknown")
-        header = f"{'='*60}\n"
-        header += f"语音转录结果\n"
-        header += f"{'='*60}\n\n"
-        header += f"📁 文件: {Path(audio_file_path).name}\n"
-        header += f"⏱️ 时长: {duration_minutes:.1f} 分钟\n"
-        header += f"🌐 语言: {detected_language}\n"
-        header += f"👥 说话人分离: {'已启用' if enable_diarization else '未启用'}\n"
-        if enable_diarization and num_speakers > 0:
-            header += f"🎤 识别说话人数: {num_speakers} 位\n"
-        header += f"📅 转录时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n"
-        header += f"\n{'='*60}\n\n"
-        
-        full_result = header + result_text
+        profiler = JobProfiler(
+            output_path,
+            enabled=profile,
+            torch_ops=duration_minutes * 60 <= TORCH_PROFILE_MAX_SECONDS
+        )
+        profiler.start()
+        try:
+            full_result = run_pipeline(
+                audio_file_path, language, enable_diarization, word_timestamps,
+                duration_minutes * 60, profiler
+            )
+        finally:
+            profiler.stop()
         
         # 保存到文件
         with open(output_path, 'w', encoding='utf-8') as f:
@@ -374,10 +825,127 @@ def process_audio_in_background(
             pass
 
 
+def launch_standalone_process(
+    audio_file_path: str,
+    output_path: Path,
+    language: Optional[str],
+    enable_diarization: bool,
+    word_timestamps: bool,
+    log_file: Path,
+    stderr_file: Path,
+    profile: bool = False
+) -> subprocess.Popen:
+    """启动独立 Python 进程处理长音频"""
+    python_exe = sys.executable  # 使用当前Python解释器
+    script_path = STANDALONE_SCRIPT
+    
+    # 复制当前环境变量,确保HUGGINGFACE_TOKEN等被传递
+    env = os.environ.copy()
+    
+    # Windows平台使用CREATE_NO_WINDOW创建后台进程
+    if os.name == 'nt':
+        CREATE_NO_WINDOW = 0x08000000
+        creation_flags = CREATE_NO_WINDOW
+    else:
+        creation_flags = 0
+    
+    # 启动独立进程(子进程继承输出文件句柄,启动后父进程即可关闭自己的句柄)
+    with open(stderr_file, 'w', encoding='utf-8', buffering=1) as stderr_handle:
+        process = subprocess.Popen(
+            [
+                python_exe,
+                "-u",  # 无缓冲输出
+                str(script_path),
+                audio_file_path,
+                str(output_path),
+                language or "None",
+                str(enable_diarization),
+                str(log_file),
+                str(word_timestamps),
+                str(profile)
+            ],
+            env=env,  # 传递环境变量
+            stdout=stderr_handle,
+            stderr=subprocess.STDOUT,  # 合并stderr到stdout
+            creationflags=creation_flags
+        )
+    
+    logger.info(f"独立进程已启动: PID={process.pid}")
+    logger.info(f"日志文件: {log_file}")
+    logger.info(f"错误日志: {stderr_file}")
+    return process
+
+
+def write_unstarted_job_result(output_path: Path, audio_file_path: str, reason: str):
+    """任务未能启动独立进程时,把原因写入约定的输出文件,避免客户端一直等待"""
+    try:
+        with open(output_path, 'w', encoding='utf-8') as f:
+            f.write(f"❌ 任务未执行: {reason}\n")
+            f.write(f"音频文件: {audio_file_path}\n")
+            f.write(f"时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
+            f.write("请重新提交该文件\n")
+    except Exception as e:
+        logger.error(f"无法写入任务结果文件 {output_path}: {e}")
+
+
+async def run_standalone_job(job, audio_file_path: str, output_path: Path, *args):
+    """
+    等待调度器准入后启动独立进程,进程退出时释放内存额度
+    
+    排队中的任务只存在于服务器进程内: 服务器退出(stdio 模式下即客户端断开)时任务被取消,
+    此时在输出文件中写明原因。已启动的独立进程不受影响,会继续运行并写出结果。
+    """
+    process = None
+    try:
+        await job.admitted.wait()
+        process = launch_standalone_process(audio_file_path, output_path, *args)
+        # 轮询而不是在线程中 wait(),避免长任务长期占用默认线程池
+        while process.poll() is None:
+            await asyncio.sleep(PROCESS_POLL_INTERVAL)
+        returncode = process.returncode
+    except BaseException as e:
+        if isinstance(e, asyncio.CancelledError):
+            reason = "服务器在任务排队期间退出" if process is None else "服务器已退出,独立进程继续运行"
+        else:
+            reason = str(e) or type(e).__name__
+        if process is None:
+            write_unstarted_job_result(output_path, audio_file_path, reason)
+            logger.warning(f"任务 {job.job_id} 未执行: {reason}")
+        JOB_SCHEDULER.release(job, error=reason)
+        raise
+    
+    if returncode == 0:
+        JOB_SCHEDULER.release(job)
+        logger.info(f"任务 {job.job_id} 完成")
+    else:
+        JOB_SCHEDULER.release(job, error=f"独立进程退出码 {returncode}")
+        logger.error(f"任务 {job.job_id} 失败: 独立进程退出码 {returncode}")
+
+
+def format_job_status(job) -> str:
+    """格式化单个任务的状态"""
+    state_names = {
+        "queued": "排队中",
+        "running": "处理中",
+        "done": "已完成",
+        "failed": "失败",
+        "cancelled": "已取消",
+    }
+    line = f"[{job.job_id}] {job.name} - {state_names.get(job.state, job.state)}"
+    if job.state == "queued":
+        line += f" (第 {JOB_SCHEDULER.position(job)} 位)"
+    line += f", 预估内存 {job.memory / GB:.1f} GB"
+    if job.error:
+        line += f", 错误: {job.error}"
+    return line
+
+
 async def transcribe_audio_file(
     audio_file_path: str,
     language: Optional[str] = "zh",
-    enable_diarization: bool = True  # 默认开启说话人分离
+    enable_diarization: bool = True,  # 默认开启说话人分离
+    word_timestamps: bool = False,
+    profile: bool = False
 ) -> str:
     """
     转录音频文件 - 直接返回转录结果
@@ -386,6 +954,8 @@ async def transcribe_audio_file(
         audio_file_path: 音频文件路径
         language: 语言代码 (如 "zh", "en"),默认自动检测
         enable_diarization: 是否启用说话人分离
+        word_timestamps: 是否启用词级时间戳(按词分配说话人)
+        profile: 是否启用性能分析(trace 和折叠栈写在输出文件旁)
     
     Returns:
         完整的转录文本结果
@@ -401,7 +971,7 @@ async def transcribe_audio_file(
             return f"❌ 错误: 不支持的文件格式 '{file_ext}'\n\n支持的格式: {', '.join(SUPPORTED_FORMATS)}"
         
         # 检查文件时长
-        duration = get_audio_duration(audio_file_path)
+        duration = await asyncio.to_thread(get_audio_duration, audio_file_path)
         duration_minutes = duration / 60
         
         if duration_minutes > 60:
@@ -442,51 +1012,36 @@ async def transcribe_audio_file(
         # 长音频 (>3分钟): 立即返回状态，后台处理并保存到文件
         
         if duration_minutes <= 3:
-            # 短音频 - 同步处理并直接返回
+            # 短音频 - 同步处理并直接返回(耗时步骤放到线程中执行,不阻塞事件循环)
             logger.info("🎯 短音频，同步处理中...")
             
-            # 转换为 WAV 格式
-            wav_path = convert_to_wav(audio_file_path)
-            
-            # 执行转录
-            transcription = transcribe_with_whisper(wav_path, language)
-            
-            # 如果启用说话人分离
-            num_speakers = 0
-            if enable_diarization:
-                diarization = perform_diarization(wav_path)
-                result_text = merge_transcription_with_diarization(transcription, diarization)
-                num_speakers = len(set(seg["speaker"] for seg in diarization))
-            else:
-                result_text = format_simple_transcription(transcription)
-            
-            # 添加元信息
-            detected_language = transcription.get("language", "unknown")
-            header = f"{'='*60}\n"
-            header += f"语音转录结果\n"
-            header += f"{'='*60}\n\n"
-            header += f"📁 文件: {Path(audio_file_path).name}\n"
-            header += f"⏱️ 时长: {duration_minutes:.1f} 分钟\n"
-            header += f"🌐 语言: {detected_language}\n"
-            header += f"👥 说话人分离: {'已启用' if enable_diarization else '未启用'}\n"
-            if enable_diarization and num_speakers > 0:
-                header += f"🎤 识别说话人数: {num_speakers} 位\n"
-            header += f"📅 转录时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n"
-            header += f"\n{'='*60}\n\n"
-            
-            full_result = header + result_text
-            
-            logger.info(f"✅ 转录完成")
-            
-            # 清理临时文件
-            if wav_path != audio_file_path and os.path.exists(wav_path):
+            memory = estimate_job_memory(duration, separate_process=False, enable_diarization=enable_diarization)
+            async with JOB_SCHEDULER.run(Path(audio_file_path).name, PRIORITY_INTERACTIVE, memory):
+                profiler = JobProfiler(
+                    output_path,
+                    enabled=profile,
+                    torch_ops=duration <= TORCH_PROFILE_MAX_SECONDS
+                )
+                profiler.start()
                 try:
-                    os.remove(wav_path)
-                except:
-                    pass
-            
-            # 直接返回完整结果
-            return full_result
+                    full_result = await asyncio.to_thread(
+                        run_pipeline, audio_file_path, language, enable_diarization,
+                        word_timestamps, duration, profiler
+                    )
+                finally:
+                    profile_files = profiler.stop()
+                
+                if profile_files:
+                    full_result += (
+                        f"\n\n📊 性能分析:\n"
+                        f"   Chrome trace: {profile_files['trace']}\n"
+                        f"   折叠栈: {profile_files['collapsed']}\n"
+                    )
+                
+                logger.info(f"✅ 转录完成")
+                
+                # 直接返回完整结果
+                return full_result
             
         else:
             # 长音频 - 使用独立进程处理,避免MCP超时
@@ -496,46 +1051,23 @@ async def transcribe_audio_file(
             log_file = output_path.with_suffix('.log')
             stderr_file = output_path.with_suffix('.stderr')
             
-            # 使用subprocess启动独立Python进程
-            import subprocess
-            python_exe = sys.executable  # 使用当前Python解释器
-            script_path = Path(__file__).parent / "standalone_transcribe.py"
-            
-            # 复制当前环境变量,确保HUGGINGFACE_TOKEN等被传递
-            env = os.environ.copy()
+            # 提交到调度器,按内存预算排队,准入后再启动独立进程
+            memory = estimate_job_memory(duration, separate_process=True, enable_diarization=enable_diarization)
+            job = JOB_SCHEDULER.submit(Path(audio_file_path).name, PRIORITY_BATCH, memory)
+            task = asyncio.create_task(run_standalone_job(
+                job, audio_file_path, output_path, language,
+                enable_diarization, word_timestamps, log_file, stderr_file, profile
+            ))
+            BACKGROUND_TASKS.add(task)
+            task.add_done_callback(BACKGROUND_TASKS.discard)
             
-            # Windows平台使用CREATE_NO_WINDOW创建后台进程
-            if os.name == 'nt':
-                import subprocess
-                CREATE_NO_WINDOW = 0x08000000
-                creation_flags = CREATE_NO_WINDOW
+            if job.state == "queued":
+                queue_info = f"排队中,前方还有 {JOB_SCHEDULER.position(job) - 1} 个任务"
             else:
-                creation_flags = 0
-            
-            # 启动独立进程
-            process = subprocess.Popen(
-                [
-                    python_exe,
-                    "-u",  # 无缓冲输出
-                    str(script_path),
-                    audio_file_path,
-                    str(output_path),
-                    language or "None",
-                    str(enable_diarization),
-                    str(log_file)
-                ],
-                env=env,  # 传递环境变量
-                stdout=open(stderr_file, 'w', encoding='utf-8', buffering=1),
-                stderr=subprocess.STDOUT,  # 合并stderr到stdout
-                creationflags=creation_flags
-            )
-            
-            logger.info(f"独立进程已启动: PID={process.pid}")
-            logger.info(f"日志文件: {log_file}")
-            logger.info(f"错误日志: {stderr_file}")
+                queue_info = "已开始处理"
             
             # 立即返回任务信息
-            return f"""✅ 转录任务已在独立进程中启动
+            return f"""✅ 转录任务已提交,将在独立进程中处理
 
 📁 文件信息:
    - 文件名: {Path(audio_file_path).name}
@@ -546,9 +1078,13 @@ async def transcribe_audio_file(
    - 语言: {language or '自动检测'}
    - 说话人分离: {'是' if enable_diarization else '否'}
    - 设备: {'GPU (CUDA)' if torch.cuda.is_available() else 'CPU'}
-   - 进程ID: {process.pid}
 
-⏱️ 预计完成时间: 约 {estimated_time} 分钟后
+📋 任务状态:
+   - 任务ID: {job.job_id}
+   - 状态: {queue_info}
+   - 预估内存: {memory / GB:.1f} GB
+
+⏱️ 预计完成时间: 开始处理后约 {estimated_time} 分钟
 
 💾 结果将保存到:
    {output_path}
@@ -558,7 +1094,9 @@ async def transcribe_audio_file(
    错误日志: {stderr_file}
 
 🔄 处理将在独立进程中完成,不受MCP超时限制。
-完成后请打开输出文件查看转录结果。
+可用 get_job_status 查询排队位置和处理状态,完成后请打开输出文件查看转录结果。
+⚠️ 排队中的任务需要服务器保持运行: 服务器退出(stdio 模式下客户端断开)时尚未开始的任务会被取消,
+   输出文件中会写明原因;已开始处理的任务不受影响。
 """
         
     except Exception as e:
@@ -598,11 +1136,136 @@ async def list_tools() -> list[Tool]:
                         "type": "boolean",
                         "description": "是否启用说话人分离(识别不同说话人),需要 HUGGINGFACE_TOKEN",
                         "default": True
+                    },
+                    "word_timestamps": {
+                        "type": "boolean",
+                        "description": "是否启用词级时间戳。启用后按词分配说话人,并在说话人切换处拆分片段",
+                        "default": False
+                    },
+                    "profile": {
+                        "type": "boolean",
+                        "description": "是否启用性能分析。各阶段耗时和热点写入日志,Chrome trace 和折叠栈保存在输出文件旁",
+                        "default": False
                     }
                 },
                 "required": ["audio_file_path"]
             }
         ),
+        Tool(
+            name="start_stream",
+            description=(
+                "开始一个流式转录会话,返回 session_id。"
+                "之后用 push_audio_chunk 推送音频块并获取部分结果,"
+                "最后用 finish_stream 结束会话并获取完整结果。"
+            ),
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "language": {
+                        "type": "string",
+                        "description": "语言代码,如 'zh', 'en'。留空则自动检测"
+                    },
+                    "audio_format": {
+                        "type": "string",
+                        "enum": STREAM_FORMATS,
+                        "description": "音频块格式: pcm_s16le (16位小端PCM) 或 opus (Ogg/WebM 封装)",
+                        "default": "pcm_s16le"
+                    },
+                    "sample_rate": {
+                        "type": "integer",
+                        "description": "PCM 采样率",
+                        "default": 16000
+                    },
+                    "channels": {
+                        "type": "integer",
+                        "description": "PCM 声道数",
+                        "default": 1
+                    }
+                }
+            }
+        ),
+        Tool(
+            name="push_audio_chunk",
+            description="向流式转录会话推送一个 base64 编码的音频块,返回当前的部分转录结果",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "session_id": {
+                        "type": "string",
+                        "description": "start_stream 返回的会话 ID"
+                    },
+                    "audio_base64": {
+                        "type": "string",
+                        "description": "base64 编码的音频数据"
+                    }
+                },
+                "required": ["session_id", "audio_base64"]
+            }
+        ),
+        Tool(
+            name="finish_stream",
+            description="结束流式转录会话,解码剩余音频并返回完整转录结果",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "session_id": {
+                        "type": "string",
+                        "description": "start_stream 返回的会话 ID"
+                    }
+                },
+                "required": ["session_id"]
+            }
+        ),
+        Tool(
+            name="get_job_status",
+            description="查询长音频转录任务的状态和排队位置。不指定 job_id 时列出所有排队中和处理中的任务",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "job_id": {
+                        "type": "string",
+                        "description": "transcribe_audio 返回的任务ID"
+                    }
+                }
+            }
+        ),
+        Tool(
+            name="search_transcripts",
+            description=(
+                "在已转录的全部结果中检索片段,可按关键词、说话人、时间范围和文件名组合查询。"
+                "例如: 查询 SPEAKER_01 在 10:00 到 20:00 之间关于某个主题的发言"
+            ),
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "query": {
+                        "type": "string",
+                        "description": "关键词,多个词用空格分隔(需全部出现)"
+                    },
+                    "speaker": {
+                        "type": "string",
+                        "description": "说话人标签,如 'SPEAKER_01'"
+                    },
+                    "start_time": {
+                        "type": "string",
+                        "description": "时间范围起点,如 '10:00' 或 '01:02:03' 或秒数"
+                    },
+                    "end_time": {
+                        "type": "string",
+                        "description": "时间范围终点,格式同 start_time"
+                    },
+                    "file": {
+                        "type": "string",
+                        "description": "只在路径包含该字符串的文件中查询"
+                    },
+                    "limit": {
+                        "type": "integer",
+                        "description": "最多返回条数",
+                        "default": 50
+                    }
+                }
+            }
+        ),
         Tool(
             name="get_supported_formats",
             description="获取支持的音频格式列表",
@@ -614,15 +1277,33 @@ async def list_tools() -> list[Tool]:
     ]
 
 
+def current_client():
+    """返回发起当前请求的 MCP 会话(stdio 模式下只有一个客户端)"""
+    try:
+        return app.request_context.session
+    except LookupError:
+        return app
+
+
 @app.call_tool()
 async def call_tool(name: str, arguments: dict) -> list[TextContent]:
-    """处理工具调用"""
+    """处理工具调用,耗时工具按客户端公平排队"""
+    if name in LIMITED_TOOLS:
+        async with REQUEST_LIMITER.slot(current_client()):
+            return await handle_tool_call(name, arguments)
+    return await handle_tool_call(name, arguments)
+
+
+async def handle_tool_call(name: str, arguments: dict) -> list[TextContent]:
+    """执行工具调用"""
     
     try:
         if name == "transcribe_audio":
             audio_file_path = arguments.get("audio_file_path")
             language = arguments.get("language")
             enable_diarization = arguments.get("enable_diarization", True)
+            word_timestamps = arguments.get("word_timestamps", False)
+            profile = arguments.get("profile", False)
             
             if not audio_file_path:
                 return [TextContent(
@@ -633,11 +1314,99 @@ async def call_tool(name: str, arguments: dict) -> list[TextContent]:
             result = await transcribe_audio_file(
                 audio_file_path=audio_file_path,
                 language=language,
-                enable_diarization=enable_diarization
+                enable_diarization=enable_diarization,
+                word_timestamps=word_timestamps,
+                profile=profile
             )
             
             return [TextContent(type="text", text=result)]
         
+        elif name == "start_stream":
+            reap_idle_stream_sessions()
+            if len(STREAM_SESSIONS) >= MAX_STREAM_SESSIONS:
+                return [TextContent(
+                    type="text",
+                    text=f"错误: 流式会话数已达上限 ({MAX_STREAM_SESSIONS}),请先结束已有会话"
+                )]
+            
+            session = StreamSession(
+                transcribe_fn=transcribe_pcm_window,
+                language=arguments.get("language"),
+                audio_format=arguments.get("audio_format", "pcm_s16le"),
+                sample_rate=int(arguments.get("sample_rate", 16000)),
+                channels=int(arguments.get("channels", 1)),
+                owner=current_client()
+            )
+            STREAM_SESSIONS[session.session_id] = session
+            logger.info(f"流式会话已创建: {session.session_id} ({session.audio_format})")
+            
+            return [TextContent(
+                type="text",
+                text=f"✅ 流式会话已创建\nsession_id: {session.session_id}"
+            )]
+        
+        elif name == "push_audio_chunk":
+            session = get_stream_session(arguments.get("session_id"))
+            if session is None:
+                return [TextContent(type="text", text="错误: 会话不存在或已结束")]
+            
+            chunk = base64.b64decode(arguments.get("audio_base64", ""))
+            await asyncio.to_thread(session.push, chunk)
+            return [TextContent(type="text", text=format_stream_status(session))]
+        
+        elif name == "finish_stream":
+            session = get_stream_session(arguments.get("session_id"))
+            if session is None:
+                return [TextContent(type="text", text="错误: 会话不存在或已结束")]
+            STREAM_SESSIONS.pop(session.session_id, None)
+            
+            try:
+                segments = await asyncio.to_thread(session.finish)
+            finally:
+                session.close()
+            
+            logger.info(f"流式会话已结束: {session.session_id}, 时长 {session.duration:.1f} 秒")
+            result_text = format_simple_transcription({"segments": segments})
+            header = f"{'='*60}\n"
+            header += f"流式转录结果\n"
+            header += f"{'='*60}\n\n"
+            header += f"⏱️ 时长: {session.duration / 60:.1f} 分钟\n"
+            header += f"🌐 语言: {session.language_detected or 'unknown'}\n"
+            header += f"\n{'='*60}\n\n"
+            return [TextContent(type="text", text=header + result_text)]
+        
+        elif name == "get_job_status":
+            job_id = arguments.get("job_id")
+            if job_id:
+                job = JOB_SCHEDULER.jobs.get(job_id)
+                if job is None:
+                    return [TextContent(type="text", text=f"错误: 任务不存在: {job_id}")]
+                return [TextContent(type="text", text=format_job_status(job))]
+            
+            status = JOB_SCHEDULER.status()
+            lines = [
+                f"内存: {status['memory_used_gb']:.1f} / {status['memory_budget_gb']:.1f} GB "
+                f"(另有模型常驻 {status['memory_reserved_gb']:.1f} GB)",
+                f"处理中: {status['running']} 个, 排队中: {status['queued']} 个",
+                "",
+            ]
+            active = [job for job in JOB_SCHEDULER.jobs.values() if job.state in ("queued", "running")]
+            for job in sorted(active, key=lambda j: (j.state != "running", JOB_SCHEDULER.position(j))):
+                lines.append(format_job_status(job))
+            return [TextContent(type="text", text="\n".join(lines))]
+        
+        elif name == "search_transcripts":
+            results = await asyncio.to_thread(
+                transcript_store.search,
+                query=arguments.get("query"),
+                speaker=arguments.get("speaker"),
+                start_time=arguments.get("start_time"),
+                end_time=arguments.get("end_time"),
+                file=arguments.get("file"),
+                limit=arguments.get("limit", 50)
+            )
+            return [TextContent(type="text", text=format_search_results(results))]
+        
         elif name == "get_supported_formats":
             formats_text = "支持的音频格式:\n" + "\n".join(f"- {fmt}" for fmt in SUPPORTED_FORMATS)
             return [TextContent(type="text", text=formats_text)]
@@ -651,9 +1420,8 @@ async def call_tool(name: str, arguments: dict) -> list[TextContent]:
         return [TextContent(type="text", text=error_message)]
 
 
-async def main():
-    """主函数"""
-    # 使用 stdio 传输运行服务器
+async def run_stdio():
+    """使用 stdio 传输运行服务器(每个客户端一个进程)"""
     from mcp.server.stdio import stdio_server
     
     async with stdio_server() as (read_stream, write_stream):
@@ -665,5 +1433,109 @@ async def main():
         )
 
 
+def require_token(asgi_app, token: str):
+    """包装 ASGI 应用: 请求头需带 "Authorization: Bearer <token>",否则返回 401"""
+    from starlette.responses import PlainTextResponse
+    
+    expected = f"Bearer {token}".encode()
+    
+    async def wrapped(scope, receive, send):
+        if scope["type"] == "http":
+            provided = dict(scope["headers"]).get(b"authorization", b"")
+            if not hmac.compare_digest(provided, expected):
+                await PlainTextResponse("未授权", status_code=401)(scope, receive, send)
+                return
+        await asgi_app(scope, receive, send)
+    
+    return wrapped
+
+
+async def run_sse(host: str, port: int, auth_token: Optional[str] = None):
+    """
+    使用 HTTP/SSE 传输运行服务器
+    
+    一个进程服务多个客户端: 模型、缓存和流式会话在客户端之间共享,
+    耗时请求由 REQUEST_LIMITER 限制总并发并在客户端之间轮转。
+    auth_token 不为空时所有请求(包括 /status)都需要携带该令牌。
+    """
+    import uvicorn
+    from mcp.server.sse import SseServerTransport
+    from starlette.applications import Starlette
+    from starlette.responses import JSONResponse, Response
+    from starlette.routing import Mount, Route
+    
+    sse = SseServerTransport("/messages/")
+    
+    async def handle_sse(request):
+        async with sse.connect_sse(request.scope, request.receive, request._send) as (read_stream, write_stream):
+            await app.run(
+                read_stream,
+                write_stream,
+                app.create_initialization_options()
+            )
+        return Response()
+    
+    async def handle_status(request):
+        status = REQUEST_LIMITER.status()
+        status["stream_sessions"] = len(STREAM_SESSIONS)
+        status["scheduler"] = JOB_SCHEDULER.status()
+        return JSONResponse(status)
+    
+    starlette_app = Starlette(routes=[
+        Route("/sse", endpoint=handle_sse),
+        Route("/status", endpoint=handle_status),
+        Mount("/messages/", app=sse.handle_post_message),
+    ])
+    
+    asgi_app = require_token(starlette_app, auth_token) if auth_token else starlette_app
+    
+    logger.info(f"Speech-to-Text MCP Server 已启动 (SSE): http://{host}:{port}/sse")
+    logger.info(f"访问令牌: {'已启用' if auth_token else '未启用(仅限本机访问)'}")
+    logger.info(
+        f"并发限制: 总计 {REQUEST_LIMITER.max_concurrent}, "
+        f"每个客户端 {REQUEST_LIMITER.per_client}"
+    )
+    config = uvicorn.Config(asgi_app, host=host, port=port, log_level="info")
+    await uvicorn.Server(config).serve()
+
+
+async def main():
+    """主函数"""
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Speech-to-Text MCP Server")
+    parser.add_argument("--transport", choices=["stdio", "sse"], default="stdio",
+                        help="传输方式: stdio (默认) 或 sse (HTTP/SSE,多客户端共享一个进程)")
+    parser.add_argument("--host", default="127.0.0.1", help="SSE 模式监听地址")
+    parser.add_argument("--port", type=int, default=8000, help="SSE 模式监听端口")
+    parser.add_argument("--auth-token", default=os.environ.get("STT_AUTH_TOKEN"),
+                        help="SSE 模式的访问令牌(默认取 STT_AUTH_TOKEN),监听非本机地址时必须设置")
+    parser.add_argument("--max-concurrent", type=int, default=REQUEST_LIMITER.max_concurrent,
+                        help="同时执行的耗时请求数上限")
+    parser.add_argument("--per-client", type=int, default=REQUEST_LIMITER.per_client,
+                        help="每个客户端同时执行的耗时请求数上限")
+    parser.add_argument("--memory-budget-gb", type=float,
+                        help="转录任务的内存预算(GB),默认取 STT_MEMORY_BUDGET_GB 或物理内存的 80%%")
+    args = parser.parse_args()
+    
+    # 工具可以读取服务器上任意音频路径、在音频旁写入结果并检索所有人的转录,不能无令牌对外开放
+    if args.transport == "sse" and args.host not in LOOPBACK_HOSTS and not args.auth_token:
+        parser.error(f"监听非本机地址 {args.host} 时必须通过 --auth-token 或 STT_AUTH_TOKEN 设置访问令牌")
+    
+    REQUEST_LIMITER.max_concurrent = args.max_concurrent
+    REQUEST_LIMITER.per_client = args.per_client
+    if args.memory_budget_gb:
+        JOB_SCHEDULER.memory_budget = int(args.memory_budget_gb * GB)
+    logger.info(f"转录任务内存预算: {JOB_SCHEDULER.memory_budget / GB:.1f} GB")
+    
+    reaper = asyncio.create_task(reap_stream_sessions_periodically())
+    BACKGROUND_TASKS.add(reaper)
+    
+    if args.transport == "sse":
+        await run_sse(args.host, args.port, args.auth_token)
+    else:
+        await run_stdio()
+
+
 if __name__ == "__main__":
     asyncio.run(main())
@@ -28,13 +28,15 @@ def main():
     
     if len(sys.argv) < 5:
         logger.error("参数不足")
-        logger.error("用法: python standalone_transcribe.py <audio_file> <output_file> <language> <enable_diarization> [log_file]")
+        logger.error("用法: python standalone_transcribe.py <audio_file> <output_file> <language> <enable_diarization> [log_file] [word_timestamps] [profile]")
         sys.exit(1)
     
     audio_file_path = sys.argv[1]
     output_path = sys.argv[2]
     language = sys.argv[3] if sys.argv[3] != "None" else None
     enable_diarization = sys.argv[4].lower() == "true"
+    word_timestamps = len(sys.argv) > 6 and sys.argv[6].lower() == "true"
+    profile = len(sys.argv) > 7 and sys.argv[7].lower() == "true"
     
     # 设置日志文件
     if len(sys.argv) > 5:
@@ -61,6 +63,8 @@ def main():
     logger.info(f"输出文件: {output_path}")
     logger.info(f"语言: {language}")
     logger.info(f"说话人分离: {enable_diarization}")
+    logger.info(f"词级时间戳: {word_timestamps}")
+    logger.info(f"性能分析: {profile}")
     logger.info("="*60)
     
     # 创建处理标记文件
@@ -76,14 +80,8 @@ def main():
     try:
         # 导入处理函数
         sys.path.insert(0, str(Path(__file__).parent))
-        from server import (
-            convert_to_wav,
-            transcribe_with_whisper,
-            perform_diarization,
-            merge_transcription_with_diarization,
-            format_simple_transcription,
-            get_audio_duration
-        )
+        from server import get_audio_duration, run_pipeline
+        from profiling import JobProfiler, TORCH_PROFILE_MAX_SECONDS
         
         # 获取时长
         duration = get_audio_duration(audio_file_path)
@@ -91,41 +89,20 @@ def main():
         
         logger.info(f"音频时长: {duration_minutes:.1f} 分钟")
         
-        # 转换为WAV
-        logger.info("转换为WAV格式...")
-        wav_path = convert_to_wav(audio_file_path)
-        
-        # 执行转录
-        logger.info("开始Whisper转录...")
-        transcription = transcribe_with_whisper(wav_path, language)
-        logger.info(f"转录完成,片段数: {len(transcription.get('segments', []))}")
-        
-        # 如果启用说话人分离
-        num_speakers = 0
-        if enable_diarization:
-            logger.info("开始说话人分离...")
-            diarization = perform_diarization(wav_path)
-            result_text = merge_transcription_with_diarization(transcription, diarization)
-            num_speakers = len(set(seg["speaker"] for seg in diarization))
-            logger.info(f"说话人分离完成,识别 {num_speakers} 位说话人")
-        else:
-            result_text = format_simple_transcription(transcription)
-        
-        # 添加元信息
-        detected_language = transcription.get("language", "unknown")
-        header = f"{'='*60}\n"
-        header += f"语音转录结果\n"
-        header += f"{'='*60}\n\n"
-        header += f"📁 文件: {Path(audio_file_path).name}\n"
-        header += f"⏱️ 时长: {duration_minutes:.1f} 分钟\n"
-        header += f"🌐 语言: {detected_language}\n"
-        header += f"👥 说话人分离: {'已启用' if enable_diarization else '未启用'}\n"
-        if enable_diarization and num_speakers > 0:
-            header += f"🎤 识别说话人数: {num_speakers} 位\n"
-        header += f"📅 转录时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n"
-        header += f"\n{'='*60}\n\n"
-        
-        full_result = header + result_text
+        # 转换WAV、转录、说话人分离、合并并写入索引库
+        profiler = JobProfiler(
+            Path(output_path),
+            enabled=profile,
+            torch_ops=duration <= TORCH_PROFILE_MAX_SECONDS
+        )
+        profiler.start()
+        try:
+            full_result = run_pipeline(
+                audio_file_path, language, enable_diarization, word_timestamps,
+                duration, profiler
+            )
+        finally:
+            profiler.stop()
         
         # 保存到文件
         with open(output_path, 'w', encoding='utf-8') as f:
@@ -0,0 +1,96 @@
+"""
+流式转录测试脚本
+把本地音频文件切成块,按实时速度(或更快)推送到流式会话,打印部分结果和延迟
+
+用法:
+    python stream_file.py <audio_file> [chunk_seconds] [language] [--opus] [--realtime]
+
+默认先用 ffmpeg 把文件解码为 16 kHz s16le PCM 再分块推送;
+--opus 时直接按字节切分原文件推送(文件需为 Opus/Ogg/WebM 等 ffmpeg 可从管道识别的格式)。
+"""
+import sys
+import time
+import base64
+import subprocess
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+from audio_stream import StreamSession, SAMPLE_RATE
+from server import transcribe_pcm_window, format_stream_status, format_simple_transcription
+
+
+def read_pcm(audio_path: str) -> bytes:
+    """用 ffmpeg 把音频文件解码为 16 kHz 单声道 s16le PCM"""
+    result = subprocess.run(
+        ['ffmpeg', '-loglevel', 'error', '-i', audio_path,
+         '-f', 's16le', '-acodec', 'pcm_s16le', '-ar', str(SAMPLE_RATE), '-ac', '1', 'pipe:1'],
+        capture_output=True, check=True
+    )
+    return result.stdout
+
+
+def main():
+    args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    if not args:
+        print("用法: python stream_file.py <audio_file> [chunk_seconds] [language] [--opus] [--realtime]")
+        sys.exit(1)
+
+    audio_path = args[0]
+    chunk_seconds = float(args[1]) if len(args) > 1 else 0.5
+    language = args[2] if len(args) > 2 else None
+    use_opus = "--opus" in sys.argv
+    realtime = "--realtime" in sys.argv
+
+    if use_opus:
+        data = Path(audio_path).read_bytes()
+        # Opus 码率未知时按文件时长估算每块字节数
+        duration = float(subprocess.run(
+            ['ffprobe', '-v', 'error', '-show_entries', 'format=duration',
+             '-of', 'default=noprint_wrappers=1:nokey=1', audio_path],
+            capture_output=True, text=True, check=True
+        ).stdout.strip())
+        chunk_bytes = max(1, int(len(data) / duration * chunk_seconds))
+        session = StreamSession(transcribe_pcm_window, language, audio_format="opus")
+    else:
+        data = read_pcm(audio_path)
+        chunk_bytes = int(SAMPLE_RATE * chunk_seconds) * 2
+        session = StreamSession(transcribe_pcm_window, language)
+
+    print(f"会话 {session.session_id}: {len(data)} 字节, 每块 {chunk_bytes} 字节")
+
+    latencies = []
+    started = time.perf_counter()
+    try:
+        for offset in range(0, len(data), chunk_bytes):
+            # 经过 base64 往返,与 MCP 调用路径保持一致
+            chunk = base64.b64decode(base64.b64encode(data[offset:offset + chunk_bytes]))
+
+            t0 = time.perf_counter()
+            decoded = session.push(chunk)
+            elapsed = time.perf_counter() - t0
+
+            if decoded:
+                latencies.append(elapsed)
+                print("-" * 60)
+                print(f"解码耗时 {elapsed:.2f} 秒")
+                print(format_stream_status(session))
+
+            if realtime:
+                time.sleep(max(0.0, chunk_seconds - elapsed))
+
+        segments = session.finish()
+    finally:
+        session.close()
+
+    total = time.perf_counter() - started
+    print("=" * 60)
+    print(format_simple_transcription({"segments": segments}))
+    print("=" * 60)
+    print(f"音频时长 {session.duration:.1f} 秒, 总耗时 {total:.1f} 秒, 解码 {len(latencies)} 次")
+    if latencies:
+        latencies.sort()
+        print(f"部分结果延迟: 中位数 {latencies[len(latencies) // 2]:.2f} 秒, 最大 {latencies[-1]:.2f} 秒")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+"""
+负载测试用的模拟后端
+替换 server 中的模型相关函数,按配置模拟处理延迟和内存占用,不需要模型文件、GPU 或网络
+
+配置通过环境变量 STT_STUB_CONFIG (JSON) 传入,独立进程会继承:
+    rtf              转录耗时 / 音频时长
+    diarization_rtf  说话人分离耗时 / 音频时长
+    model_load       每个进程首次加载模型的耗时(秒)
+    jitter           耗时随机浮动比例(0.2 表示 ±10%)
+    memory_scale     模拟内存 = 音频时长 × 16000 × 4 字节 × memory_scale
+    failure_rate     转录失败比例
+    seed             随机种子
+
+音频文件名需包含时长,如 clip_0001_150s.wav,不含时长时退回 ffprobe。
+相同的 文件名 + 种子 总是得到相同的耗时和结果。
+
+用法:
+    python stub_backend.py --server [server.py 参数]    以模拟后端启动 MCP 服务器
+    python stub_backend.py <standalone_transcribe 参数>  以模拟后端运行独立转录进程
+"""
+import os
+import re
+import sys
+import json
+import time
+import zlib
+import asyncio
+from pathlib import Path
+
+import numpy as np
+
+DEFAULT_CONFIG = {
+    "rtf": 0.01,
+    "diarization_rtf": 0.005,
+    "model_load": 0.5,
+    "jitter": 0.2,
+    "memory_scale": 1.0,
+    "failure_rate": 0.0,
+    "seed": 0,
+}
+
+DURATION_PATTERN = re.compile(r"_(\d+(?:\.\d+)?)s\.\w+$")
+
+
+def load_config() -> dict:
+    config = dict(DEFAULT_CONFIG)
+    config.update(json.loads(os.environ.get("STT_STUB_CONFIG", "{}")))
+    return config
+
+
+def uniform(config: dict, *key) -> float:
+    """由 种子 + key 确定的 [0, 1) 伪随机数(跨进程稳定,不受 hash 随机化影响)"""
+    text = ":".join(str(k) for k in (config["seed"], *key))
+    return zlib.crc32(text.encode("utf-8")) / 2 ** 32
+
+
+def duration_from_name(audio_path: str) -> float:
+    match = DURATION_PATTERN.search(Path(audio_path).name)
+    if match is None:
+        raise ValueError(f"文件名中没有时长: {audio_path}")
+    return float(match.group(1))
+
+
+def stage_time(config: dict, audio_path: str, duration: float, stage: str) -> float:
+    """模拟的 transcribe / diarization 阶段耗时"""
+    rate = config["rtf"] if stage == "transcribe" else config["diarization_rtf"]
+    jitter = config["jitter"] * (uniform(config, Path(audio_path).name, stage) - 0.5)
+    return duration * rate * (1 + jitter)
+
+
+def service_time(config: dict, audio_path: str, duration: float, enable_diarization: bool) -> float:
+    """模拟后端处理一个文件的耗时(不含模型加载),负载测试据此估算排队时间"""
+    seconds = stage_time(config, audio_path, duration, "transcribe")
+    if enable_diarization:
+        seconds += stage_time(config, audio_path, duration, "diarization")
+    return seconds
+
+
+def simulate_work(seconds: float, duration: float, config: dict):
+    """占用与音频时长成正比的内存并等待指定时间"""
+    buffer = np.ones(int(duration * 16000 * config["memory_scale"]), dtype=np.float32)
+    time.sleep(seconds)
+    del buffer
+
+
+class StubModule:
+    """代替 torch 模块,支持性能分析的前向钩子注册"""
+
+    class _Handle:
+        def remove(self):
+            pass
+
+    def register_forward_pre_hook(self, hook):
+        return self._Handle()
+
+    def register_forward_hook(self, hook):
+        return self._Handle()
+
+
+class StubModel:
+    encoder = StubModule()
+    decoder = StubModule()
+
+
+def install(server):
+    """用模拟实现替换 server 模块中的模型和音频处理函数"""
+    config = load_config()
+    real_get_audio_duration = server.get_audio_duration
+    loaded = {}
+
+    def initialize_whisper_model(model_size: str = "medium"):
+        if "whisper" not in loaded:
+            server.JOB_SCHEDULER.reserve("whisper", server.WHISPER_MODEL_MEMORY)
+            time.sleep(config["model_load"])
+            loaded["whisper"] = StubModel()
+        return loaded["whisper"]
+
+    def initialize_diarization_pipeline():
+        if "diarization" not in loaded:
+            server.JOB_SCHEDULER.reserve("diarization", server.DIARIZATION_MODEL_MEMORY)
+            time.sleep(config["model_load"] / 2)
+            loaded["diarization"] = object()
+        return loaded["diarization"]
+
+    def get_audio_duration(audio_path: str) -> float:
+        try:
+            return duration_from_name(audio_path)
+        except ValueError:
+            return real_get_audio_duration(audio_path)
+
+    def convert_to_wav(audio_path: str) -> str:
+        return audio_path
+
+    def load_pcm(audio_path: str) -> str:
+        # 合成的音频文件是空文件,直接把路径交给模拟的转录/分离函数
+        return audio_path
+
+    def transcribe_with_whisper(audio_path, language=None, word_timestamps=False):
+        initialize_whisper_model()
+        name = Path(audio_path).name
+        duration = get_audio_duration(audio_path)
+        simulate_work(stage_time(config, audio_path, duration, "transcribe"), duration, config)
+
+        if uniform(config, name, "failure") < config["failure_rate"]:
+            raise RuntimeError(f"模拟转录失败: {name}")
+
+        segments = []
+        for i, start in enumerate(np.arange(0.0, duration, 5.0)):
+            end = min(start + 5.0, duration)
+            segment = {"start": float(start), "end": float(end), "text": f" 模拟片段 {i}"}
+            if word_timestamps:
+                step = (end - start) / 4
+                segment["words"] = [
+                    {"word": f" w{j}", "start": float(start + j * step),
+                     "end": float(start + (j + 1) * step), "probability": 1.0}
+                    for j in range(4)
+                ]
+            segments.append(segment)
+
+        result = {
+            "text": "".join(seg["text"] for seg in segments),
+            "segments": segments,
+            "language": language or "zh",
+        }
+        if word_timestamps:
+            result["words"] = server.extract_word_arrays(result)
+        return result
+
+    def perform_diarization(audio_path: str, hook=None) -> list:
+        initialize_diarization_pipeline()
+        duration = get_audio_duration(audio_path)
+        simulate_work(stage_time(config, audio_path, duration, "diarization"), duration, config)
+        return [
+            {"start": float(start), "end": float(min(start + 7.0, duration)), "speaker": f"SPEAKER_{i % 2:02d}"}
+            for i, start in enumerate(np.arange(0.0, duration, 7.0))
+        ]
+
+    server.initialize_whisper_model = initialize_whisper_model
+    server.initialize_diarization_pipeline = initialize_diarization_pipeline
+    server.get_audio_duration = get_audio_duration
+    server.convert_to_wav = convert_to_wav
+    server.load_pcm = load_pcm
+    server.transcribe_with_whisper = transcribe_with_whisper
+    server.perform_diarization = perform_diarization
+    # 长音频的独立进程同样使用模拟后端
+    server.STANDALONE_SCRIPT = Path(__file__).resolve()
+
+
+if __name__ == "__main__":
+    sys.path.insert(0, str(Path(__file__).parent))
+    import server
+
+    install(server)
+
+    if len(sys.argv) > 1 and sys.argv[1] == "--server":
+        sys.argv = [sys.argv[0], *sys.argv[2:]]
+        asyncio.run(server.main())
+    else:
+        import standalone_transcribe
+        standalone_transcribe.main()
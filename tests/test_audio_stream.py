@@ -0,0 +1,110 @@
+"""audio_stream 环形缓冲区和滑动窗口逻辑的测试(使用模拟转录函数,不需要模型或 ffmpeg)"""
+import numpy as np
+
+from audio_stream import PCMRingBuffer, StreamSession, SAMPLE_RATE
+
+
+def make_pcm(start_second: int, seconds: int) -> bytes:
+    """每一秒的样本值都等于该秒的序号 / 1024,便于从解码的音频还原出时间位置"""
+    labels = np.repeat(np.arange(start_second, start_second + seconds), SAMPLE_RATE)
+    return (labels * 32).astype("<i2").tobytes()
+
+
+def seconds_in(audio: np.ndarray) -> list:
+    return sorted(set(np.round(audio * 1024).astype(int).tolist()))
+
+
+def fake_transcriber(segment_seconds=None):
+    """
+    模拟 Whisper: 按 segment_seconds 切分输入音频,片段文本为其中包含的秒序号;
+    segment_seconds 为 None 时整个输入只返回一个片段
+    """
+    calls = []
+
+    def transcribe(audio, language, prompt):
+        calls.append(len(audio))
+        step = len(audio) if segment_seconds is None else segment_seconds * SAMPLE_RATE
+        segments = []
+        for start in range(0, len(audio), step):
+            piece = audio[start:start + step]
+            segments.append({
+                "start": start / SAMPLE_RATE,
+                "end": (start + len(piece)) / SAMPLE_RATE,
+                "text": " " + " ".join(str(s) for s in seconds_in(piece)),
+            })
+        return {"segments": segments, "language": "zh"}
+
+    transcribe.calls = calls
+    return transcribe
+
+
+def covered_seconds(segments: list) -> list:
+    return sorted(int(s) for seg in segments for s in seg["text"].split())
+
+
+def assert_timestamps_match_audio(segments: list):
+    for seg in segments:
+        assert int(round(seg["start"])) == int(seg["text"].split()[0])
+
+
+def test_ring_buffer_wraps_around():
+    buffer = PCMRingBuffer(10)
+    buffer.write(np.arange(7, dtype=np.float32))
+    buffer.write(np.arange(7, 14, dtype=np.float32))
+
+    assert buffer.total == 14
+    assert buffer.start == 4
+    np.testing.assert_array_equal(buffer.read(0), np.arange(4, 14))
+    np.testing.assert_array_equal(buffer.read(9), np.arange(9, 14))
+
+
+def test_ring_buffer_oversized_write_advances_clock():
+    buffer = PCMRingBuffer(10)
+    buffer.write(np.arange(3, dtype=np.float32))
+    buffer.write(np.arange(3, 28, dtype=np.float32))
+
+    assert buffer.total == 28
+    np.testing.assert_array_equal(buffer.read(0), np.arange(18, 28))
+    buffer.write(np.array([28, 29], dtype=np.float32))
+    np.testing.assert_array_equal(buffer.read(0), np.arange(20, 30))
+
+
+def test_large_chunk_keeps_stream_clock():
+    session = StreamSession(fake_transcriber(5))
+    session.push(make_pcm(0, 40))
+
+    assert session.duration == 40.0
+    segments = session.finish()
+    assert covered_seconds(segments) == list(range(40))
+    assert_timestamps_match_audio(segments)
+
+
+def test_full_window_is_committed_before_overwrite():
+    # 转录结果只有一个片段时,窗口内的音频一直是临时结果,直到窗口写满
+    transcribe = fake_transcriber(None)
+    session = StreamSession(transcribe)
+    session.push(make_pcm(0, 27))
+    assert session.committed == []
+
+    session.push(make_pcm(27, 5))
+    assert session.committed[0]["start"] == 0.0
+    assert covered_seconds(session.committed) == list(range(30))
+
+    segments = session.finish()
+    assert covered_seconds(segments) == list(range(32))
+    assert max(transcribe.calls) <= 30 * SAMPLE_RATE
+
+
+def test_streaming_in_small_chunks_covers_all_audio():
+    rng = np.random.default_rng(0)
+    session = StreamSession(fake_transcriber(4))
+    position = 0
+    while position < 95:
+        seconds = int(rng.integers(1, 4))
+        session.push(make_pcm(position, seconds))
+        position += seconds
+
+    segments = session.finish()
+    assert session.duration == position
+    assert covered_seconds(segments) == list(range(position))
+    assert_timestamps_match_audio(segments)
@@ -0,0 +1,52 @@
+"""profiling 的 trace 导出测试"""
+import json
+import asyncio
+
+import torch
+
+from profiling import JobProfiler
+
+
+def run_stages(profiler: JobProfiler):
+    with profiler.torch_scope():
+        with profiler.stage("transcribe"):
+            torch.ones(64, 64) @ torch.ones(64, 64)
+        with profiler.stage("merge"):
+            pass
+
+
+def test_torch_trace_covers_worker_thread(tmp_path):
+    profiler = JobProfiler(tmp_path / "job", enabled=True, torch_ops=True)
+
+    async def main():
+        # 与服务器短音频路径相同: start/stop 在事件循环线程,流水线在工作线程
+        profiler.start()
+        try:
+            await asyncio.to_thread(run_stages, profiler)
+        finally:
+            return profiler.stop()
+
+    files = asyncio.run(main())
+    with open(files["trace"], encoding="utf-8") as f:
+        events = json.load(f)["traceEvents"]
+
+    names = {event.get("name") for event in events}
+    assert "aten::mm" in names
+    own_stages = [e for e in events if e.get("cat") == "stage"]
+    assert {e["name"] for e in own_stages} == {"transcribe", "merge"}
+
+    # 合并进来的阶段事件与 torch 的 record_function 标记对齐
+    marker = next(e for e in events if e.get("cat") == "user_annotation" and e["name"] == "transcribe")
+    stage = next(e for e in own_stages if e["name"] == "transcribe")
+    assert abs(marker["ts"] - stage["ts"]) < 1000
+
+
+def test_trace_without_torch_ops_keeps_stage_events(tmp_path):
+    profiler = JobProfiler(tmp_path / "job", enabled=True, torch_ops=False)
+    profiler.start()
+    run_stages(profiler)
+    files = profiler.stop()
+
+    with open(files["trace"], encoding="utf-8") as f:
+        events = json.load(f)["traceEvents"]
+    assert {e["name"] for e in events} == {"transcribe", "merge"}
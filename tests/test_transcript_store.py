@@ -0,0 +1,61 @@
+"""transcript_store 检索测试"""
+import sqlite3
+
+import transcript_store
+
+
+def segment(start, text, speaker=None):
+    return {"start": start, "end": start + 5.0, "text": text, "speaker": speaker}
+
+
+def texts(results):
+    return [r["text"] for r in results]
+
+
+def test_short_cjk_terms_use_index(tmp_path):
+    db = tmp_path / "t.db"
+    transcript_store.index_transcript("a.wav", [
+        segment(0, "今年的预算需要调整", "SPEAKER_00"),
+        segment(5, "算预的顺序不同", "SPEAKER_01"),
+        segment(700, "股价下跌影响预算", "SPEAKER_01"),
+    ], db_path=db)
+
+    assert texts(transcript_store.search("预算", db_path=db)) == ["今年的预算需要调整", "股价下跌影响预算"]
+    assert texts(transcript_store.search("预算", speaker="SPEAKER_01", start_time="10:00", db_path=db)) == ["股价下跌影响预算"]
+    assert texts(transcript_store.search("股价 预算", db_path=db)) == ["股价下跌影响预算"]
+    assert texts(transcript_store.search("顺", db_path=db)) == ["算预的顺序不同"]
+
+
+def test_reindex_replaces_short_term_index(tmp_path):
+    db = tmp_path / "t.db"
+    transcript_store.index_transcript("a.wav", [segment(0, "旧的预算")], db_path=db)
+    transcript_store.index_transcript("a.wav", [segment(0, "新的计划")], db_path=db)
+
+    assert transcript_store.search("预算", db_path=db) == []
+    assert texts(transcript_store.search("计划", db_path=db)) == ["新的计划"]
+
+
+def test_old_database_is_backfilled(tmp_path):
+    db = tmp_path / "t.db"
+    transcript_store.index_transcript("a.wav", [segment(0, "今年的预算")], db_path=db)
+    conn = sqlite3.connect(db)
+    conn.execute("DROP TABLE segments_cjk")
+    conn.execute("PRAGMA user_version = 0")
+    conn.commit()
+    conn.close()
+
+    assert texts(transcript_store.search("预算", db_path=db)) == ["今年的预算"]
+
+
+def test_short_latin_terms_match_substrings(tmp_path):
+    db = tmp_path / "t.db"
+    transcript_store.index_transcript("a.wav", [
+        segment(0, "OpenAI released a model"),
+        segment(5, "snake_case names"),
+        segment(10, "其他内容"),
+    ], db_path=db)
+
+    assert texts(transcript_store.search("AI", db_path=db)) == ["OpenAI released a model"]
+    assert texts(transcript_store.search("Op", db_path=db)) == ["OpenAI released a model"]
+    assert texts(transcript_store.search("_", db_path=db)) == ["snake_case names"]
+    assert texts(transcript_store.search("AI 模型", db_path=db)) == []
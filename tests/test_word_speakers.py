@@ -0,0 +1,47 @@
+"""server.assign_speakers_to_words 说话人分配测试"""
+import numpy as np
+
+import server
+
+
+def words_at(*midpoints):
+    start = np.array(midpoints, dtype=np.float32) - 0.1
+    return {"start": start, "end": start + 0.2}
+
+
+def turn(start, end, speaker):
+    return {"start": start, "end": end, "speaker": speaker}
+
+
+def test_words_inside_turns():
+    diarization = [turn(0, 5, "A"), turn(5, 10, "B")]
+    speakers = server.assign_speakers_to_words(words_at(1, 4.9, 6, 9), diarization)
+    assert list(speakers) == ["A", "A", "B", "B"]
+
+
+def test_overlapping_turns():
+    # A 的长语音段中插入 B 的短语音段: 重叠部分归 B,B 结束后回到 A
+    diarization = [turn(0, 10, "A"), turn(3, 4, "B"), turn(8, 12, "C")]
+    speakers = server.assign_speakers_to_words(words_at(1, 3.5, 6, 9, 11), diarization)
+    assert list(speakers) == ["A", "B", "A", "C", "C"]
+
+
+def test_gap_words_go_to_nearest_turn():
+    diarization = [turn(0, 5, "A"), turn(6, 10, "B"), turn(20, 25, "C")]
+    speakers = server.assign_speakers_to_words(words_at(5.3, 5.8, 10.5, 15, 19.5), diarization)
+    assert list(speakers) == ["A", "B", "B", "UNKNOWN", "C"]
+
+
+def test_words_before_first_and_after_last_turn():
+    diarization = [turn(2, 5, "A"), turn(5, 8, "B")]
+    speakers = server.assign_speakers_to_words(words_at(0.2, 1.5, 8.5, 12), diarization)
+    assert list(speakers) == ["UNKNOWN", "A", "B", "UNKNOWN"]
+
+
+def test_gap_word_does_not_split_run():
+    words = words_at(1, 2, 5.4, 7, 8)
+    words["segment"] = np.zeros(5, dtype=np.int32)
+    words["text"] = np.array(["a", "b", "c", "d", "e"], dtype=object)
+    diarization = [turn(0, 5, "A"), turn(6.5, 9, "A")]
+    segments = server.split_words_by_speaker(words, server.assign_speakers_to_words(words, diarization))
+    assert [s["speaker"] for s in segments] == ["A"]
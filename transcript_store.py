@@ -0,0 +1,252 @@
+"""
+转录结果索引库
+把转录片段写入本地 SQLite 数据库(FTS5 全文索引),支持按关键词、说话人、时间范围查询
+"""
+import os
+import re
+import sqlite3
+import logging
+from pathlib import Path
+from typing import Optional, Union
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+# 数据库位置,可通过 STT_TRANSCRIPT_DB 环境变量修改
+DEFAULT_DB_PATH = Path(__file__).parent / "transcripts.db"
+
+# trigram 分词器对中文也能做子串匹配,但查询词至少需要 3 个字符;
+# 更短的查询词(如 "预算")使用 segments_cjk 索引: 中日韩字符逐字拆开后用 unicode61 分词,
+# 查询词同样拆开后作为短语匹配,即连续出现的字
+FTS_MIN_QUERY_LENGTH = 3
+
+# 中日韩字符(假名、汉字、谚文)
+CJK_PATTERN = re.compile(r"([\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uac00-\ud7af])")
+
+# 表结构版本,旧版本数据库在打开时补建索引
+SCHEMA_VERSION = 1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS transcripts (
+    id INTEGER PRIMARY KEY,
+    file TEXT NOT NULL UNIQUE,
+    language TEXT,
+    duration REAL,
+    created_at TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS segments (
+    id INTEGER PRIMARY KEY,
+    transcript_id INTEGER NOT NULL REFERENCES transcripts(id) ON DELETE CASCADE,
+    start REAL NOT NULL,
+    end REAL NOT NULL,
+    speaker TEXT,
+    text TEXT NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_segments_transcript ON segments(transcript_id, start);
+CREATE INDEX IF NOT EXISTS idx_segments_speaker ON segments(speaker, start);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS segments_fts USING fts5(
+    text,
+    content='segments',
+    content_rowid='id',
+    tokenize='trigram'
+);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS segments_cjk USING fts5(
+    text,
+    content='',
+    tokenize='unicode61'
+);
+"""
+
+
+def get_db_path() -> Path:
+    return Path(os.environ.get("STT_TRANSCRIPT_DB", DEFAULT_DB_PATH))
+
+
+def split_cjk(text: str) -> str:
+    """在每个中日韩字符两侧加空格,使 unicode61 分词器把它们逐字切分"""
+    return CJK_PATTERN.sub(r" \1 ", text)
+
+
+def connect(db_path: Optional[Union[str, Path]] = None) -> sqlite3.Connection:
+    """打开数据库并确保表结构存在"""
+    conn = sqlite3.connect(str(db_path or get_db_path()), timeout=30)
+    conn.row_factory = sqlite3.Row
+    conn.create_function("split_cjk", 1, split_cjk, deterministic=True)
+    # WAL 模式允许多个转录进程同时写入时读取不被阻塞
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA foreign_keys=ON")
+    conn.executescript(SCHEMA)
+
+    if conn.execute("PRAGMA user_version").fetchone()[0] < SCHEMA_VERSION:
+        # 旧数据库没有 segments_cjk 索引,按已有片段补建
+        with conn:
+            conn.execute("INSERT INTO segments_cjk(segments_cjk) VALUES ('delete-all')")
+            conn.execute("INSERT INTO segments_cjk(rowid, text) SELECT id, split_cjk(text) FROM segments")
+            conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+    return conn
+
+
+def parse_time(value: Union[str, float, int, None]) -> Optional[float]:
+    """把 "SS"、"MM:SS"、"HH:MM:SS(.mmm)" 或秒数转换为秒"""
+    if value is None or value == "":
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    seconds = 0.0
+    for part in str(value).strip().split(":"):
+        seconds = seconds * 60 + float(part)
+    return seconds
+
+
+def index_transcript(
+    file: str,
+    segments: list,
+    language: Optional[str] = None,
+    duration: Optional[float] = None,
+    db_path: Optional[Union[str, Path]] = None
+) -> int:
+    """
+    写入一个文件的全部转录片段(同一文件重复写入时替换旧结果)
+
+    segments: [{"start", "end", "text", "speaker"(可选)}, ...]
+    所有片段在一个事务中批量插入,之后一次性更新全文索引。
+
+    Returns:
+        transcript id
+    """
+    file = str(Path(file).resolve())
+    rows = [
+        (seg["start"], seg["end"], seg.get("speaker"), seg["text"].strip())
+        for seg in segments
+        if seg["text"].strip()
+    ]
+
+    conn = connect(db_path)
+    try:
+        with conn:
+            old = conn.execute("SELECT id FROM transcripts WHERE file = ?", (file,)).fetchone()
+            if old is not None:
+                # 外部内容 FTS 表需要用原文显式删除索引项
+                conn.execute(
+                    "INSERT INTO segments_fts(segments_fts, rowid, text) "
+                    "SELECT 'delete', id, text FROM segments WHERE transcript_id = ?",
+                    (old["id"],)
+                )
+                conn.execute(
+                    "INSERT INTO segments_cjk(segments_cjk, rowid, text) "
+                    "SELECT 'delete', id, split_cjk(text) FROM segments WHERE transcript_id = ?",
+                    (old["id"],)
+                )
+                conn.execute("DELETE FROM transcripts WHERE id = ?", (old["id"],))
+
+            transcript_id = conn.execute(
+                "INSERT INTO transcripts (file, language, duration, created_at) VALUES (?, ?, ?, ?)",
+                (file, language, duration, datetime.now().isoformat(timespec="seconds"))
+            ).lastrowid
+
+            conn.executemany(
+                "INSERT INTO segments (transcript_id, start, end, speaker, text) VALUES (?, ?, ?, ?, ?)",
+                [(transcript_id, *row) for row in rows]
+            )
+            conn.execute(
+                "INSERT INTO segments_fts(rowid, text) "
+                "SELECT id, text FROM segments WHERE transcript_id = ?",
+                (transcript_id,)
+            )
+            conn.execute(
+                "INSERT INTO segments_cjk(rowid, text) "
+                "SELECT id, split_cjk(text) FROM segments WHERE transcript_id = ?",
+                (transcript_id,)
+            )
+    finally:
+        conn.close()
+
+    logger.info(f"已写入转录索引: {file} ({len(rows)} 个片段)")
+    return transcript_id
+
+
+def search(
+    query: Optional[str] = None,
+    speaker: Optional[str] = None,
+    start_time: Union[str, float, None] = None,
+    end_time: Union[str, float, None] = None,
+    file: Optional[str] = None,
+    limit: int = 50,
+    db_path: Optional[Union[str, Path]] = None
+) -> list:
+    """
+    查询转录片段
+
+    Args:
+        query: 关键词(多个词用空格分隔,需全部出现)
+        speaker: 说话人标签,如 SPEAKER_01
+        start_time / end_time: 时间范围(秒或 "MM:SS"),返回与该范围重叠的片段
+        file: 文件路径或文件名中包含的字符串
+        limit: 最多返回条数
+
+    Returns:
+        [{"file", "language", "start", "end", "speaker", "text"}, ...]
+    """
+    conditions = []
+    params = []
+    terms = query.split() if query else []
+    fts_terms = [t for t in terms if len(t) >= FTS_MIN_QUERY_LENGTH]
+    short_terms = [t for t in terms if len(t) < FTS_MIN_QUERY_LENGTH]
+    # 全由 CJK 字符组成的短词按单字索引匹配;其余短词(如 "AI"、标点)需要匹配词的一部分,
+    # 单字索引按完整词切分拉丁字母,无法做到,退回 LIKE 扫描
+    cjk_terms = [t for t in short_terms if all(CJK_PATTERN.match(c) for c in t)]
+    like_terms = [t for t in short_terms if t not in cjk_terms]
+
+    # 每个词作为短语加引号,避免被解析为 FTS 语法
+    if fts_terms:
+        match = " AND ".join('"' + t.replace('"', '""') + '"' for t in fts_terms)
+        conditions.append("s.id IN (SELECT rowid FROM segments_fts WHERE segments_fts MATCH ?)")
+        params.append(match)
+    if cjk_terms:
+        match = " AND ".join('"' + split_cjk(t).replace('"', '""') + '"' for t in cjk_terms)
+        conditions.append("s.id IN (SELECT rowid FROM segments_cjk WHERE segments_cjk MATCH ?)")
+        params.append(match)
+    # 有全文匹配时由匹配结果驱动查询: 列名前加 "+" 阻止规划器改用说话人/时间索引
+    # 扫描大量行(常见说话人 + 宽时间范围时比按 rowid 取匹配片段慢两个数量级)
+    col = "+s." if fts_terms or cjk_terms else "s."
+
+    for term in like_terms:
+        conditions.append("s.text LIKE ? ESCAPE '\\'")
+        params.append("%" + re.sub(r"([%_\\])", r"\\\1", term) + "%")
+
+    if speaker:
+        conditions.append(f"{col}speaker = ?")
+        params.append(speaker)
+
+    start_seconds = parse_time(start_time)
+    end_seconds = parse_time(end_time)
+    if start_seconds is not None:
+        conditions.append(f"{col}end >= ?")
+        params.append(start_seconds)
+    if end_seconds is not None:
+        conditions.append(f"{col}start <= ?")
+        params.append(end_seconds)
+
+    if file:
+        conditions.append(f"{col}transcript_id IN (SELECT id FROM transcripts WHERE file LIKE ?)")
+        params.append(f"%{file}%")
+
+    sql = (
+        "SELECT t.file, t.language, s.start, s.end, s.speaker, s.text "
+        "FROM segments s JOIN transcripts t ON t.id = s.transcript_id"
+    )
+    if conditions:
+        sql += " WHERE " + " AND ".join(conditions)
+    sql += " ORDER BY s.transcript_id, s.start LIMIT ?"
+    params.append(int(limit))
+
+    conn = connect(db_path)
+    try:
+        return [dict(row) for row in conn.execute(sql, params)]
+    finally:
+        conn.close()